@@ -0,0 +1,159 @@
+"""Generación de reportes PDF por lotes, sin Streamlit.
+
+Ejemplos:
+    python batch_reports.py --tipo Diario --desde 2025-01-01 --hasta 2025-01-31 --zip enero.zip
+    python batch_reports.py --tipo Semanal --out reportes/
+    python batch_reports.py --tipo Mensual --periodos Enero Febrero --areas Estampado --workers 4
+
+Los datos se reconcilian una vez con el spreadsheet (o se leen solo de la
+copia local con --offline) y cada proceso del pool carga la copia local.
+"""
+import argparse
+import os
+import sys
+import time
+import tomllib
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from dataset import index_sheets, reconcile_sheets
+from metrics import MetricsEngine, all_metrics
+from pdf_cache import PDF_CACHE_DIR, PdfCache
+from report import OEE_SHEETS, PERIOD_TYPES, REPORT_AREAS, cached_report, crear_pdf, period_options, report_filename, resolve_period
+from sheets import SHEET_GIDS
+from snapshots import SNAPSHOT_DIR, SnapshotStore
+from sources import SheetsSource
+
+
+def report_sheets(tipo):
+    """Hojas que usan los reportes de `tipo`: eventos, producción y su hoja OEE."""
+    return ("datos", "prod", OEE_SHEETS[tipo])
+
+
+def read_spreadsheet_url(path=".streamlit/secrets.toml"):
+    with open(path, "rb") as f:
+        return tomllib.load(f)["connections"]["gsheets"]["spreadsheet"].strip()
+
+
+# ==========================================
+# ESTADO DE CADA PROCESO DEL POOL
+# ==========================================
+_state = {}
+
+
+def init_worker(snapshot_dir, cache_dir, tipo):
+    store = SnapshotStore(snapshot_dir)
+    frames = [store.load(name)[0] if name in report_sheets(tipo) else None for name in SHEET_GIDS]
+    frames, _, rollups = index_sheets([pd.DataFrame() if df is None else df for df in frames])
+    sheets = dict(zip(SHEET_GIDS, frames))
+    _state["oee"] = {tipo: sheets[name] for tipo, name in OEE_SHEETS.items()}
+    _state["engines"] = {tipo: MetricsEngine(df) for tipo, df in _state["oee"].items()}
+    _state["rollups"] = rollups
+    _state["cache"] = PdfCache(cache_dir) if cache_dir else None
+
+
+def build_report(area, tipo, valor):
+    t0 = time.perf_counter()
+    periodo = resolve_period(tipo, valor, _state["oee"][tipo])
+    metricas = all_metrics(_state["engines"][tipo], periodo.oee_target, periodo.key)
+    if _state["cache"] is not None:
+        pdf = cached_report(_state["cache"], area, periodo, metricas, _state["rollups"])
+    else:
+        pdf = crear_pdf(area, periodo.label, metricas, periodo.ini, periodo.fin, _state["rollups"])
+    return report_filename(area, periodo.label), pdf, time.perf_counter() - t0
+
+
+# ==========================================
+# CLI
+# ==========================================
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Genera reportes PDF de indicadores por lotes.")
+    p.add_argument("--tipo", choices=PERIOD_TYPES, default="Diario")
+    p.add_argument("--desde", help="Primer día (Diario), AAAA-MM-DD. Por defecto, el último día con datos.")
+    p.add_argument("--hasta", help="Último día (Diario), AAAA-MM-DD. Por defecto, igual a --desde.")
+    p.add_argument("--periodos", nargs="+", help="Semanas o meses (Semanal/Mensual). Por defecto, todos.")
+    p.add_argument("--areas", nargs="+", choices=REPORT_AREAS, default=list(REPORT_AREAS))
+    dest = p.add_mutually_exclusive_group()
+    dest.add_argument("--out", default="reportes", help="Directorio de salida.")
+    dest.add_argument("--zip", help="Escribe todos los PDF en este archivo .zip.")
+    p.add_argument("--workers", type=int, default=os.cpu_count())
+    p.add_argument("--spreadsheet", help="URL del spreadsheet. Por defecto, la de .streamlit/secrets.toml.")
+    p.add_argument("--snapshots", default=SNAPSHOT_DIR, help="Directorio de la copia local de las hojas.")
+    p.add_argument("--offline", action="store_true", help="No descarga: usa solo la copia local.")
+    p.add_argument("--cache", default=PDF_CACHE_DIR, help="Directorio de la caché de PDF compartida con la app.")
+    p.add_argument("--no-cache", action="store_true", help="Regenera todos los PDF sin usar la caché.")
+    return p.parse_args(argv)
+
+
+def list_periods(args, sheets):
+    if args.tipo != "Diario":
+        opciones = period_options(sheets[OEE_SHEETS[args.tipo]], args.tipo)
+        # Un período que no está en la hoja OEE saldría como un PDF en blanco
+        desconocidos = [p for p in args.periodos or () if p not in opciones]
+        if desconocidos:
+            sys.exit(f"Períodos sin datos en la hoja OEE {args.tipo}: {', '.join(desconocidos)}. "
+                     f"Disponibles: {', '.join(opciones) or 'ninguno'}.")
+        return args.periodos or opciones
+    if args.desde:
+        ini = pd.Timestamp(args.desde)
+    else:
+        ini = sheets["datos"]["Fecha_Filtro"].max()
+    fin = pd.Timestamp(args.hasta) if args.hasta else ini
+    return list(pd.date_range(ini, fin, freq="D"))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = SnapshotStore(args.snapshots)
+    names = report_sheets(args.tipo)
+    if args.offline:
+        frames = store.load_all(names)
+        if frames is None:
+            sys.exit(f"No hay copia local de {', '.join(names)} en {args.snapshots}.")
+    else:
+        frames, fallidas = reconcile_sheets(SheetsSource(args.spreadsheet or read_spreadsheet_url()), store, names)
+        if fallidas:
+            print(f"Aviso: no se pudieron descargar {', '.join(fallidas)}; se usa la copia local.", file=sys.stderr)
+    sheets = dict(zip(names, frames))
+    if sheets["datos"].empty:
+        sys.exit("No hay datos cargados en la base principal.")
+
+    jobs = [(area, args.tipo, valor) for valor in list_periods(args, sheets) for area in args.areas]
+    if not jobs:
+        sys.exit("No hay períodos para generar.")
+
+    archive = zipfile.ZipFile(args.zip, "w", zipfile.ZIP_DEFLATED) if args.zip else None
+    if archive is None:
+        os.makedirs(args.out, exist_ok=True)
+
+    t0 = time.perf_counter()
+    errores = 0
+    workers = max(1, min(args.workers or 1, len(jobs)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(args.snapshots, None if args.no_cache else args.cache, args.tipo)) as pool:
+        futures = {pool.submit(build_report, *job): job for job in jobs}
+        for fut in as_completed(futures):
+            area, tipo, valor = futures[fut]
+            try:
+                nombre, pdf, segundos = fut.result()
+            except Exception as e:
+                errores += 1
+                print(f"ERROR {area} {tipo} {valor}: {e}", file=sys.stderr)
+                continue
+            if archive is not None:
+                archive.writestr(nombre, pdf)
+            else:
+                with open(os.path.join(args.out, nombre), "wb") as f:
+                    f.write(pdf)
+            print(f"{nombre:<45} {segundos:6.2f}s")
+    if archive is not None:
+        archive.close()
+
+    destino = args.zip or args.out
+    print(f"{len(jobs) - errores}/{len(jobs)} reportes en {destino} ({time.perf_counter() - t0:.1f}s, {workers} procesos)")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Benchmarks offline de carga, filtros, métricas y PDF sobre hojas sintéticas.
+
+Ejemplos:
+    python -m benchmarks.run
+    python -m benchmarks.run --rows 10000 1000000 5000000 --repeat 3
+    python -m benchmarks.run --skip-pdf --compare last
+
+Cada corrida guarda sus tiempos en benchmarks/results/<fecha>.json; con
+--compare se muestran junto a los de una corrida anterior.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import ensure_csvs
+from charts import top_fallas, warm_renderer
+from dataset import index_sheets
+from metrics import MetricsEngine, all_metrics
+from report import crear_pdf, period_options, resolve_period
+from sheets import SHEET_GIDS, SHEET_SCHEMAS, process_df
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "results")
+DATA_DIR = os.environ.get("INDICADORES_BENCH_DATA", os.path.join(HERE, "data"))
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=HERE).stdout.strip()
+    except OSError:
+        return None
+
+
+# ==========================================
+# ETAPAS
+# ==========================================
+def dashboard_filter(rollups, date_idx, ini, fin):
+    # Mismo camino que la sección 5 con todas las fábricas y máquinas elegidas
+    fabricas = sorted(date_idx['datos'].machines)
+    maquinas = date_idx['datos'].machines_for(fabricas)
+    rollups['prod'].window(ini, fin)
+    return rollups['datos'].window(ini, fin, {'Fábrica': fabricas, 'Máquina': maquinas})
+
+
+def bench_size(rows, args):
+    paths = ensure_csvs(args.data_dir, rows, args.days, args.seed)
+    content = {}
+    for name, path in paths.items():
+        with open(path, "rb") as f:
+            content[name] = f.read()
+    small = [name for name in SHEET_GIDS if name != "datos"]
+    stages = {}
+
+    stages["process_df datos"] = measure(lambda: process_df(content["datos"], SHEET_SCHEMAS["datos"]), args.repeat)
+    stages["process_df otras hojas"] = measure(lambda: [process_df(content[n], SHEET_SCHEMAS[n]) for n in small], args.repeat)
+    frames = [process_df(content[n], SHEET_SCHEMAS[n]) for n in SHEET_GIDS]
+    stages["index_sheets"] = measure(lambda: index_sheets(frames), args.repeat)
+    (df_raw, df_oee_diario, _, _, df_oee_sem, df_oee_men), date_idx, rollups = index_sheets(frames)
+
+    last = date_idx['datos'].last_day()
+    periodos = {
+        "día": resolve_period("Diario", last, df_oee_diario),
+        "semana": resolve_period("Semanal", period_options(df_oee_sem, "Semanal")[-1], df_oee_sem),
+        "mes": resolve_period("Mensual", period_options(df_oee_men, "Mensual")[-1], df_oee_men),
+    }
+    oee = {"día": df_oee_diario, "semana": df_oee_sem, "mes": df_oee_men}
+    for nombre, p in periodos.items():
+        stages[f"filtro {nombre}"] = measure(lambda: dashboard_filter(rollups, date_idx, p.ini, p.fin), args.repeat)
+    stages["filtro todo"] = measure(lambda: dashboard_filter(rollups, date_idx, None, None), args.repeat)
+
+    for nombre, p in periodos.items():
+        # Motor nuevo en cada repetición: índice + todas las áreas, sin caché
+        stages[f"métricas {nombre}"] = measure(lambda: all_metrics(MetricsEngine(oee[nombre]), p.oee_target, p.key), args.repeat)
+
+    df_mes = dashboard_filter(rollups, date_idx, periodos["mes"].ini, periodos["mes"].fin)
+    stages["top 15 fallas mes"] = measure(lambda: top_fallas(df_mes, 15), args.repeat)
+
+    if not args.skip_pdf:
+        warm_renderer()
+        p = periodos["semana"]
+        metricas = all_metrics(MetricsEngine(df_oee_sem), p.oee_target, p.key)
+        # La primera llamada rasteriza los gráficos; las siguientes usan la caché de render
+        times = measure(lambda: crear_pdf("Estampado", p.label, metricas, p.ini, p.fin, rollups), args.repeat + 1)
+        stages["crear_pdf (render)"] = times[:1]
+        stages["crear_pdf (caché)"] = times[1:]
+
+    return [
+        {"rows": rows, "stage": stage, "repeat": len(t),
+         "min_ms": round(min(t) * 1000, 3), "median_ms": round(statistics.median(t) * 1000, 3)}
+        for stage, t in stages.items()
+    ]
+
+
+# ==========================================
+# RESULTADOS
+# ==========================================
+def load_previous(ref, exclude=None):
+    if ref != "last":
+        with open(ref, encoding="utf-8") as f:
+            return json.load(f)
+    files = sorted(f for f in glob.glob(os.path.join(RESULTS_DIR, "*.json")) if f != exclude)
+    if not files:
+        return None
+    with open(files[-1], encoding="utf-8") as f:
+        return json.load(f)
+
+
+def print_table(results, previous=None):
+    before = {(r["rows"], r["stage"]): r["median_ms"] for r in (previous or {}).get("results", [])}
+    print(f"{'filas':>10}  {'etapa':<26} {'mediana ms':>12} {'mín ms':>10}" + (f" {'antes ms':>10} {'cambio':>8}" if previous else ""))
+    for r in results:
+        line = f"{r['rows']:>10}  {r['stage']:<26} {r['median_ms']:>12.2f} {r['min_ms']:>10.2f}"
+        old = before.get((r["rows"], r["stage"]))
+        if previous and old:
+            line += f" {old:>10.2f} {r['median_ms'] / old:>7.2f}x"
+        print(line)
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmarks de INDICADORES sobre datos sintéticos.")
+    p.add_argument("--rows", nargs="+", type=int, default=[10_000, 100_000, 1_000_000], help="Filas de la hoja Datos.")
+    p.add_argument("--days", type=int, help="Días cubiertos. Por defecto, según las filas (30 a 730).")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--skip-pdf", action="store_true", help="No mide crear_pdf (no requiere kaleido).")
+    p.add_argument("--data-dir", default=DATA_DIR, help="Dónde se guardan los CSV sintéticos.")
+    p.add_argument("--out", help="Archivo de resultados. Por defecto, benchmarks/results/<fecha>.json.")
+    p.add_argument("--compare", help="Resultados previos a comparar, o 'last' para la corrida anterior.")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    for rows in args.rows:
+        print(f"== {rows} filas", file=sys.stderr)
+        results += bench_size(rows, args)
+
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    previous = load_previous(args.compare, exclude=out) if args.compare else None
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {"commit": git_commit(), "python": platform.python_version(), "pandas": pd.__version__,
+                     "platform": platform.platform(), "args": vars(args), "saved_at": time.time()},
+            "results": results,
+        }, f, ensure_ascii=False, indent=1)
+
+    print_table(results, previous)
+    print(f"\nResultados en {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
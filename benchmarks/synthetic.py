@@ -0,0 +1,130 @@
+"""Hojas sintéticas con la forma de las del spreadsheet, como CSV en disco.
+
+Los CSV imitan la exportación de Google Sheets: fechas dd/mm/aaaa, decimales
+con coma y porcentajes como texto ("85,3%"). Se generan una vez por tamaño y
+semilla en `data_dir` y se reutilizan en corridas siguientes.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from sheets import SHEET_GIDS
+
+START = pd.Timestamp("2024-01-01")
+
+LINES = {
+    'Estampado': ['L1', 'L2', 'L3', 'L4'],
+    'Soldadura': ['CELDA 1', 'CELDA 2', 'CELDA 3', 'PRP'],
+}
+MACHINES = [(fab, maq) for fab, maqs in LINES.items() for maq in maqs]
+OEE_ROWS = ['GENERAL', 'ESTAMPADO', 'L1', 'L2', 'L3', 'L4', 'SOLDADURA', 'CELDA 1', 'CELDA 2', 'CELDA 3', 'PRP']
+NIVEL_3 = ['FALLA MECANICA', 'FALLA ELECTRICA', 'SETUP', 'FALTA MATERIAL', 'CALIDAD']
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto',
+         'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+
+def _fechas(days):
+    return pd.date_range(START, periods=days, freq='D').strftime('%d/%m/%Y').to_numpy()
+
+
+def _porcentajes(rng, n):
+    return np.char.replace(np.char.mod('%.1f%%', rng.uniform(60, 99.5, n)), '.', ',')
+
+
+def datos(rng, rows, days):
+    # Filas en orden de carga: ascienden por día, como la hoja real
+    day = np.sort(rng.integers(0, days, rows))
+    maq = rng.integers(0, len(MACHINES), rows)
+    produccion = rng.random(rows) < 0.6
+    nivel3 = rng.integers(0, len(NIVEL_3), rows)
+    fabs = np.array([f for f, _ in MACHINES], dtype=object)
+    maqs = np.array([m for _, m in MACHINES], dtype=object)
+    minutos = np.where(produccion, rng.gamma(4.0, 15.0, rows), rng.exponential(12.0, rows))
+    return pd.DataFrame({
+        'Fecha': _fechas(days)[day],
+        'Fábrica': fabs[maq],
+        'Máquina': maqs[maq],
+        'Evento': np.where(produccion, 'Producción', 'Parada'),
+        'Nivel Evento 3': np.where(produccion, '', np.array(NIVEL_3, dtype=object)[nivel3]),
+        'Nivel Evento 4': np.where(produccion, '', 'Detalle'),
+        'Nivel Evento 6': np.where(produccion, '', np.char.add('Causa ', rng.integers(1, 80, rows).astype(str))),
+        'Tiempo (Min)': np.round(minutos, 2),
+        'Operador': np.char.add('Operador ', rng.integers(1, 60, rows).astype(str)),
+        'Inicio': '06:00',
+        'Fin': '14:00',
+    })
+
+
+def oee_diario(rng, days):
+    n = days * len(OEE_ROWS)
+    return pd.DataFrame({
+        'Fecha': np.repeat(_fechas(days), len(OEE_ROWS)),
+        'Línea': np.tile(OEE_ROWS, days),
+        **{c: _porcentajes(rng, n) for c in ('OEE', 'Disponibilidad', 'Performance', 'Calidad')},
+    })
+
+
+def oee_periodo(rng, days, freq):
+    # Semanas (W-SUN) o meses completos dentro del rango de días generado
+    fin_rango = START + pd.Timedelta(days=days - 1)
+    inicios = pd.date_range(START, fin_rango, freq='W-MON' if freq == 'Semanal' else 'MS')
+    filas = []
+    for k, ini in enumerate(inicios):
+        fin = min(ini + (pd.Timedelta(days=6) if freq == 'Semanal' else pd.offsets.MonthEnd(0)), fin_rango)
+        label = f"S{k + 1}" if freq == 'Semanal' else f"{MESES[ini.month - 1]} {ini.year}"
+        for linea in OEE_ROWS:
+            filas.append((label, ini.strftime('%d/%m/%Y'), fin.strftime('%d/%m/%Y'), linea))
+    df = pd.DataFrame(filas, columns=['Semana' if freq == 'Semanal' else 'Mes', 'Inicio', 'Fin', 'Línea'])
+    for c in ('OEE', 'Disponibilidad', 'Performance', 'Calidad'):
+        df[c] = _porcentajes(rng, len(df))
+    return df
+
+
+def produccion(rng, days):
+    n = days * len(MACHINES)
+    return pd.DataFrame({
+        'Fecha': np.repeat(_fechas(days), len(MACHINES)),
+        'Fábrica': np.tile([f for f, _ in MACHINES], days),
+        'Máquina': np.tile([m for _, m in MACHINES], days),
+        'Buenas': rng.integers(100, 900, n),
+        'Retrabajo': rng.integers(0, 20, n),
+        'Observadas': rng.integers(0, 10, n),
+    })
+
+
+def operarios(rng, days, per_day=12):
+    n = days * per_day
+    return pd.DataFrame({
+        'Fecha': np.repeat(_fechas(days), per_day),
+        'Operador': np.tile([f"Operador {i}" for i in range(per_day)], days),
+        'Máquina': np.tile([MACHINES[i % len(MACHINES)][1] for i in range(per_day)], days),
+        'Eficiencia': _porcentajes(rng, n),
+    })
+
+
+def generate(rows, days=None, seed=0):
+    """Las seis hojas como {nombre: DataFrame de texto listo para CSV}."""
+    days = days or int(np.clip(rows // 300, 30, 730))
+    rng = np.random.default_rng(seed)
+    return {
+        "datos": datos(rng, rows, days),
+        "oee_diario": oee_diario(rng, days),
+        "prod": produccion(rng, days),
+        "operarios": operarios(rng, days),
+        "oee_sem": oee_periodo(rng, days, 'Semanal'),
+        "oee_men": oee_periodo(rng, days, 'Mensual'),
+    }
+
+
+def ensure_csvs(data_dir, rows, days=None, seed=0):
+    """Rutas {hoja: CSV} para este tamaño; genera los que falten."""
+    folder = os.path.join(data_dir, f"{rows}_{days or 'auto'}_{seed}")
+    paths = {name: os.path.join(folder, f"{name}.csv") for name in SHEET_GIDS}
+    if all(os.path.exists(p) for p in paths.values()):
+        return paths
+    os.makedirs(folder, exist_ok=True)
+    for name, df in generate(rows, days, seed).items():
+        df.to_csv(paths[name] + ".tmp", index=False, decimal=',')
+        os.replace(paths[name] + ".tmp", paths[name])
+    return paths
@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+from timing import count, span
+
+logger = logging.getLogger(__name__)
+
+TIPO_COLORS = {'Producción': '#2CA02C', 'Parada': '#D62728'}
+PROD_COLORS = ['#1F77B4', '#FF7F0E', '#d62728']
+
+
+# ==========================================
+# DATOS MÍNIMOS DE CADA GRÁFICO
+# ==========================================
+def event_type(s):
+    """'Producción' si el evento lo menciona, si no 'Parada' (vectorizado)."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # Se clasifica cada categoría una vez y se expande por código
+        cats = np.where(s.cat.categories.astype(str).str.contains('Producción', regex=False), 'Producción', 'Parada')
+        codes = s.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, cats[codes], 'Parada'), index=s.index)
+    return pd.Series(np.where(s.astype(str).str.contains('Producción', regex=False), 'Producción', 'Parada'), index=s.index)
+
+
+def tiempos_por_tipo(df):
+    """Minutos totales de Producción y de Parada: una fila por tipo."""
+    tipo = event_type(df['Evento'])
+    return df['Tiempo (Min)'].groupby(tipo.to_numpy()).sum().rename_axis('Tipo').reset_index()
+
+
+def top_fallas(df, n):
+    fallas = df[df['Nivel Evento 3'].astype(str).str.contains('FALLA', case=False)]
+    top = fallas.groupby('Nivel Evento 6', observed=True)['Tiempo (Min)'].sum().reset_index()
+    return top.sort_values('Tiempo (Min)', ascending=False).head(n)
+
+
+def produccion_por_maquina(df, c_maq, cols):
+    return df.groupby(c_maq, observed=True)[cols].sum().reset_index()
+
+
+def payload_bytes(fig):
+    """Tamaño del JSON que viaja al navegador (o a kaleido) para esta figura."""
+    return len(fig.to_json())
+
+
+# ==========================================
+# FIGURAS
+# ==========================================
+def pie_tiempos(data, **kwargs):
+    return px.pie(data, values='Tiempo (Min)', names='Tipo', hole=0.4, **kwargs)
+
+
+def bar_top_fallas(top):
+    fig = px.bar(top, x='Tiempo (Min)', y='Nivel Evento 6', orientation='h', text='Tiempo (Min)', color='Tiempo (Min)', color_continuous_scale='Reds')
+    fig.update_traces(texttemplate='%{text:.0f} min', textposition='outside')
+    fig.update_layout(yaxis={'categoryorder':'total ascending'}, coloraxis_showscale=False, height=450)
+    return fig
+
+
+# ==========================================
+# RENDER PNG EN MEMORIA (kaleido) CON CACHÉ
+# ==========================================
+RENDER_CACHE_SIZE = 64
+
+_render_cache = OrderedDict()
+_render_lock = threading.Lock()
+
+
+def figure_key(fig):
+    # El JSON de la figura incluye datos agregados y layout (tamaño, títulos, colores)
+    return hashlib.sha256(fig.to_json().encode()).hexdigest()
+
+
+def render_png(fig):
+    """PNG de la figura en bytes; figuras idénticas no se vuelven a rasterizar."""
+    key = figure_key(fig)
+    with _render_lock:
+        png = _render_cache.get(key)
+        count("render", hit=png is not None)
+        if png is not None:
+            _render_cache.move_to_end(key)
+            return png
+        # kaleido mantiene su proceso vivo entre llamadas; el lock lo serializa
+        with span("render", ancho=fig.layout.width, alto=fig.layout.height):
+            png = pio.to_image(fig, format="png", engine="kaleido")
+        _render_cache[key] = png
+        if len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+    return png
+
+
+def warm_renderer():
+    """Arranca kaleido de antemano para que el primer PDF no pague el inicio."""
+    try:
+        with _render_lock:
+            pio.to_image(px.bar(x=[0], y=[0]), format="png", engine="kaleido")
+    except Exception:
+        logger.exception("No se pudo iniciar kaleido")
@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+from sheets import SHEET_GIDS, SHEET_SCHEMAS
+from timing import span
+
+DATE_COL = 'Fecha_Filtro'
+
+
+class DateIndex:
+    """Offsets de inicio de cada día sobre una hoja ordenada por Fecha_Filtro.
+
+    Cualquier rango [ini, fin] se resuelve con dos búsquedas binarias y se
+    devuelve como slice posicional (sin copiar filas). También guarda, como
+    índice secundario, las máquinas de cada fábrica.
+    """
+
+    def __init__(self, df):
+        self.rows = len(df)
+        if df.empty or DATE_COL not in df.columns:
+            self.days = np.array([], dtype='datetime64[ns]')
+            self.offsets = np.array([], dtype=np.int64)
+        else:
+            dates = df[DATE_COL].to_numpy()
+            starts = np.flatnonzero(dates[1:] != dates[:-1]) + 1
+            self.offsets = np.concatenate(([0], starts)).astype(np.int64)
+            self.days = dates[self.offsets]
+        self.machines = _machines_by_factory(df)
+
+    @property
+    def empty(self):
+        return len(self.days) == 0
+
+    def first_day(self):
+        return pd.Timestamp(self.days[0]) if not self.empty else None
+
+    def last_day(self):
+        return pd.Timestamp(self.days[-1]) if not self.empty else None
+
+    def bounds(self, ini, fin):
+        if self.empty or pd.isna(ini) or pd.isna(fin):
+            return 0, 0
+        a = np.searchsorted(self.days, np.datetime64(pd.Timestamp(ini)), side='left')
+        b = np.searchsorted(self.days, np.datetime64(pd.Timestamp(fin)), side='right')
+        start = self.offsets[a] if a < len(self.offsets) else self.rows
+        stop = self.offsets[b] if b < len(self.offsets) else self.rows
+        return int(start), int(max(start, stop))
+
+    def slice(self, df, ini, fin):
+        a, b = self.bounds(ini, fin)
+        return df.iloc[a:b]
+
+    def machines_for(self, factories):
+        return sorted({m for f in factories for m in self.machines.get(f, ())})
+
+
+def _machines_by_factory(df):
+    if df.empty or 'Fábrica' not in df.columns or 'Máquina' not in df.columns:
+        return {}
+    pairs = df[['Fábrica', 'Máquina']].drop_duplicates()
+    out = {}
+    for fab, maq in zip(pairs['Fábrica'], pairs['Máquina']):
+        out.setdefault(fab, set()).add(maq)
+    return out
+
+
+def isin_mask(s, values):
+    """Máscara booleana de `s.isin(values)`; en categóricas usa los códigos."""
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        return s.isin(values).to_numpy()
+    pos = s.cat.categories.get_indexer(list(values))
+    table = np.zeros(len(s.cat.categories) + 1, dtype=bool)
+    table[pos[pos >= 0]] = True
+    # Código -1 (nulo) cae en la última posición, siempre False
+    return table[s.cat.codes.to_numpy()]
+
+
+def contains_mask(s, text):
+    """Máscara de "contiene `text`" sin distinguir mayúsculas; en categóricas, por categoría."""
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        return s.astype(str).str.contains(text, case=False, regex=False).to_numpy()
+    hit = np.asarray(s.cat.categories.astype(str).str.contains(text, case=False, regex=False), dtype=bool)
+    table = np.append(hit, False)
+    return table[s.cat.codes.to_numpy()]
+
+
+# ==========================================
+# ROLLUP DIARIO
+# ==========================================
+EVENT_KEYS = ('Fábrica', 'Máquina', 'Evento', 'Nivel Evento 3', 'Nivel Evento 6')
+EVENT_VALUES = ('Tiempo (Min)',)
+PROD_KEYS = ('Fábrica', 'Máquina')
+PROD_VALUES = ('Buenas', 'Retrabajo', 'Observadas')
+
+
+def resolve_columns(columns, names):
+    found = []
+    for name in names:
+        col = name if name in columns else next((c for c in columns if name.lower() in c.lower()), None)
+        if col is not None and col not in found:
+            found.append(col)
+    return found
+
+
+class DailyRollup:
+    """Sumas por (día, claves) de una hoja de eventos, ordenadas por día.
+
+    Conserva los nombres de columna de la hoja original, así que las mismas
+    agregaciones del dashboard y del PDF sirven sobre el rollup o sobre las
+    filas crudas. Un rango de fechas suma a lo sumo días x grupos filas.
+    """
+
+    def __init__(self, df, keys, values):
+        self.keys = resolve_columns(df.columns, keys)
+        self.values = resolve_columns(df.columns, values)
+        if df.empty or DATE_COL not in df.columns or not self.values:
+            self.cube = pd.DataFrame(columns=[DATE_COL] + self.keys + self.values)
+        else:
+            sums = df[self.values].astype('float64')
+            by = [df[DATE_COL]] + [df[k] for k in self.keys]
+            self.cube = sums.groupby(by, observed=True, sort=True).sum().reset_index()
+        self.index = DateIndex(self.cube)
+
+    @property
+    def empty(self):
+        return self.cube.empty
+
+    def window(self, ini, fin, filters=None, contains=None):
+        """Sumas diarias de [ini, fin] (todo si falta alguno), filtradas por {clave: valores}.
+
+        `contains` ({clave: texto}) deja solo las filas cuya clave contiene el texto.
+        """
+        cube = self.cube if ini is None or fin is None else self.index.slice(self.cube, ini, fin)
+        if filters or contains:
+            mask = np.ones(len(cube), dtype=bool)
+            for col, values in (filters or {}).items():
+                mask &= isin_mask(cube[col], values)
+            for col, text in (contains or {}).items():
+                mask &= contains_mask(cube[col], text)
+            cube = cube[mask]
+        return cube
+
+    def empty_window(self):
+        return self.cube.iloc[:0]
+
+
+# ==========================================
+# CARGA COMPLETA
+# ==========================================
+def reconcile_sheets(source, store, names=tuple(SHEET_GIDS)):
+    # Descarga paralela de las hojas pedidas; una hoja caída no vacía las demás
+    fetched = source.fetch(names)
+    frames = tuple(store.refresh(name, fetched[name].content, SHEET_SCHEMAS[name]) for name in names)
+    return frames, [r.name for r in fetched.values() if not r.ok]
+
+
+def index_sheets(frames):
+    with span("indices"):
+        return _index_sheets(frames)
+
+
+def _index_sheets(frames):
+    frames = dict(zip(SHEET_GIDS, frames))
+    # Sumas diarias para no re-agregar eventos crudos en cada período; el
+    # rollup agrupa ordenado, así que las hojas crudas no se ordenan
+    rollups = {
+        'datos': DailyRollup(frames['datos'], EVENT_KEYS, EVENT_VALUES),
+        'prod': DailyRollup(frames['prod'], PROD_KEYS, PROD_VALUES),
+    }
+    # Fechas y máquinas del dashboard: el índice del propio rollup de Datos
+    return tuple(frames.values()), {'datos': rollups['datos'].index}, rollups
@@ -0,0 +1,107 @@
+import threading
+from collections import defaultdict
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from timing import count
+
+# Columnas de métricas (clave -> nombre buscado en la hoja OEE)
+METRIC_COLUMNS = {'OEE': 'OEE', 'DISP': 'Disponibilidad', 'PERF': 'Performance', 'CAL': 'Calidad'}
+
+# Áreas y líneas que muestran el dashboard y los PDF
+AREAS = ['GENERAL', 'ESTAMPADO', 'L1', 'L2', 'L3', 'L4', 'SOLDADURA', 'CELDA', 'PRP']
+
+_SEP = '\x1f'
+_MAX_PERIODS = 256
+
+
+def empty_metrics():
+    return {k: 0.0 for k in METRIC_COLUMNS}
+
+
+def frame_version(df):
+    if df.empty: return 0
+    return int(pd.util.hash_pandas_object(df, index=True).sum())
+
+
+class MetricsEngine:
+    """Índice de búsqueda precalculado sobre una hoja OEE.
+
+    Al construirse arma, una sola vez, el texto en mayúsculas de cada fila y
+    resuelve las columnas OEE/Disponibilidad/Performance/Calidad. `metrics`
+    calcula todas las áreas de un período en una pasada y cachea el resultado
+    por (versión de la hoja, período).
+    """
+
+    def __init__(self, df):
+        self.version = frame_version(df)
+        self._index = df.index
+        self._cache = {}
+        # El motor se comparte entre sesiones: la caché se toca bajo lock
+        self._lock = threading.Lock()
+        if df.empty:
+            self._text = pd.Series([], dtype=object)
+            self._values = np.empty((0, len(METRIC_COLUMNS)))
+            return
+
+        as_text = [df[c].astype(str) for c in df.columns]
+        self._text = reduce(lambda a, b: a + _SEP + b, as_text).str.upper()
+
+        values = np.full((len(df), len(METRIC_COLUMNS)), np.nan)
+        for j, col_search in enumerate(METRIC_COLUMNS.values()):
+            actual_col = next((c for c in df.columns if col_search.lower() in c.lower()), None)
+            if actual_col:
+                values[:, j] = pd.to_numeric(df[actual_col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        self._values = values
+
+    def _compute(self, pos, names):
+        text = self._text.iloc[pos] if pos is not None else self._text
+        values = self._values[pos] if pos is not None else self._values
+        if len(text) == 0:
+            return {n: empty_metrics() for n in names}
+
+        # Matriz filas x áreas: qué filas mencionan a cada área
+        match = np.column_stack([text.str.contains(n.upper(), regex=False).to_numpy(dtype=bool) for n in names])
+        valid = ~np.isnan(values)
+        sums = match.T.astype(float) @ np.where(valid, values, 0.0)
+        counts = match.T.astype(float) @ valid.astype(float)
+
+        out = {}
+        for i, n in enumerate(names):
+            m = empty_metrics()
+            for j, key in enumerate(METRIC_COLUMNS):
+                if counts[i, j] > 0:
+                    v = sums[i, j] / counts[i, j]
+                    m[key] = float(v / 100 if v > 1.1 else v)
+            out[n] = m
+        return out
+
+    def metrics(self, target_df, period, names=AREAS):
+        """Métricas {área: {'OEE','DISP','PERF','CAL'}} de las filas de `target_df`."""
+        names = [n.upper() for n in names]
+        key = (self.version, period)
+        with self._lock:
+            cached = dict(self._cache.get(key, {}))
+        missing = [n for n in names if n not in cached]
+        count("metricas", hit=not missing)
+        if missing:
+            pos = self._index.get_indexer(target_df.index)
+            if (pos < 0).any():
+                # Subconjunto que no proviene de esta hoja: índice ad hoc
+                cached.update(MetricsEngine(target_df)._compute(None, missing))
+            else:
+                cached.update(self._compute(pos, missing))
+            with self._lock:
+                if key not in self._cache and len(self._cache) >= _MAX_PERIODS:
+                    self._cache.pop(next(iter(self._cache)))
+                self._cache[key] = {**self._cache.get(key, {}), **cached}
+        return {n: cached[n] for n in names}
+
+
+def all_metrics(engine, target_df, period):
+    """Todas las áreas del período; sin filas OEE, todas las métricas en 0."""
+    if engine is None or target_df.empty:
+        return defaultdict(empty_metrics)
+    return engine.metrics(target_df, period)
@@ -0,0 +1,78 @@
+import hashlib
+import logging
+import os
+import threading
+
+from timing import count
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_DIR = os.environ.get("INDICADORES_PDF_CACHE_DIR", ".pdf_cache")
+PDF_CACHE_MAX_BYTES = int(os.environ.get("INDICADORES_PDF_CACHE_MAX_MB", "200")) * 1024 * 1024
+
+
+class PdfCache:
+    """PDF ya generados en disco, con tope de tamaño y desalojo LRU.
+
+    La clave incluye la versión de los datos del período, así que un PDF
+    deja de usarse solo cuando cambian los datos de ese período (o el
+    layout del reporte). El último acceso se marca con el mtime del archivo.
+    """
+
+    def __init__(self, root=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(area, label, data_version, layout_version):
+        raw = "\x1f".join(str(p) for p in (area, label, data_version, layout_version))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.pdf")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            data = None
+        count("pdf_cache", hit=data is not None)
+        return data
+
+    def put(self, key, data):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                if not name.endswith(".pdf"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.root, name))
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+            if removed:
+                logger.info("caché PDF: %d archivos desalojados, %.1f MB en uso", removed, total / 1e6)
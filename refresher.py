@@ -0,0 +1,189 @@
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+
+from dataset import index_sheets
+from sheets import SHEET_GIDS
+from timing import record, span
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = 300
+
+# Hojas que usa la vista Diario: se cargan al arrancar y se recargan juntas,
+# porque de ellas salen los índices y rollups. El resto se carga la primera
+# vez que una vista o un reporte la pide, y vence según su propio TTL.
+EAGER_SHEETS = ('datos', 'oee_diario', 'prod')
+SHEET_TTL = {'oee_sem': 1800, 'oee_men': 3600, 'operarios': 1800}
+# Tras una carga fallida se reintenta antes de que venza el TTL
+SHEET_RETRY = 30
+
+# Número de carga: distinto en cada Dataset y cada SheetEntry del proceso,
+# sirve de clave barata para cachés derivadas de una hoja
+_versions = itertools.count(1)
+
+
+@dataclass(frozen=True)
+class SheetEntry:
+    df: pd.DataFrame
+    loaded_at: float
+    expires_at: float
+    fallidas: tuple = ()
+    version: int = field(default_factory=lambda: next(_versions))
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Hojas indexadas de una carga completa; nunca se modifica, se reemplaza.
+
+    Un mismo Dataset lo leen todas las sesiones del proceso sin copiarlo.
+    Los slices y filtros que arma cada sesión son vistas copy-on-write:
+    escribir sobre ellas copia solo lo tocado y nunca altera las hojas.
+    """
+    frames: tuple
+    indexes: dict
+    rollups: dict
+    source: str
+    loaded_at: Optional[float] = None
+    refresh_seconds: Optional[float] = None
+    fallidas: tuple = ()
+    version: int = field(default_factory=lambda: next(_versions))
+
+    @classmethod
+    def from_frames(cls, frames, source, **kwargs):
+        return cls(*index_sheets(frames), source=source, **kwargs)
+
+    @classmethod
+    def empty(cls):
+        return cls.from_frames([pd.DataFrame()] * len(SHEET_GIDS), "vacío")
+
+    @property
+    def age(self):
+        return None if self.loaded_at is None else time.time() - self.loaded_at
+
+
+class DatasetRefresher:
+    """Recarga las hojas de `source` en segundo plano cada `interval` segundos.
+
+    Los lectores reciben siempre el último Dataset bueno sin esperar: la
+    recarga arma uno nuevo y lo publica con una sola asignación. Si una
+    recarga falla, se sigue sirviendo el anterior y el error queda en
+    `last_error`. Las hojas fuera de `eager` se piden con `sheet`.
+    """
+
+    def __init__(self, source, store, interval=REFRESH_INTERVAL, eager=EAGER_SHEETS, ttl=SHEET_TTL):
+        self.source = source
+        self.store = store
+        self.interval = interval
+        self.eager = tuple(eager)
+        self.ttl = ttl
+        self.last_error = None
+        self._current = None
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._sheets = {}
+        self._sheet_locks = {name: threading.Lock() for name in SHEET_GIDS}
+
+    def start(self):
+        frames = self.store.load_all(self.eager) if self.source.snapshots else None
+        if frames is not None:
+            # Arranque en frío: se sirve la copia local y se recarga enseguida
+            loaded = dict(zip(self.eager, frames))
+            self._current = Dataset.from_frames([loaded.get(n, pd.DataFrame()) for n in SHEET_GIDS], "copia local")
+            delay = 0
+        else:
+            # Sin copia local no hay nada que servir: la primera carga bloquea
+            self.refresh()
+            delay = self.interval
+        self._thread = threading.Thread(target=self._loop, args=(delay,), daemon=True, name="recarga-hojas")
+        self._thread.start()
+        return self
+
+    def current(self):
+        return self._current if self._current is not None else Dataset.empty()
+
+    def refresh(self):
+        """Una recarga completa; devuelve True si se publicó un Dataset nuevo."""
+        with self._refresh_lock:
+            t0 = time.perf_counter()
+            try:
+                (frames, indexes, rollups), fallidas = self.source.load(self.store, self.eager)
+                if len(fallidas) == len(self.eager):
+                    raise ConnectionError("no se pudo descargar ninguna hoja")
+                if rollups['datos'].empty and self._current is not None and not self._current.rollups['datos'].empty:
+                    raise ValueError("la hoja principal llegó vacía")
+                dataset = Dataset(
+                    frames, indexes, rollups, source=self.source.kind, loaded_at=time.time(),
+                    refresh_seconds=time.perf_counter() - t0, fallidas=tuple(fallidas),
+                )
+            except Exception as e:
+                logger.exception("Error recargando las hojas; se mantiene la carga anterior")
+                self.last_error = str(e)
+                return False
+            self._current = dataset
+            self.last_error = None
+            record("recarga", dataset.refresh_seconds, fallidas=len(dataset.fallidas))
+            logger.info("hojas recargadas en %.2fs", dataset.refresh_seconds)
+            return True
+
+    # ==========================================
+    # HOJAS BAJO DEMANDA
+    # ==========================================
+    def sheet(self, name):
+        return self.versioned(name)[0]
+
+    def versioned(self, name):
+        """(hoja `name`, número de carga); las no eager se cargan en el primer pedido.
+
+        Vencido su TTL se sigue sirviendo la versión cargada mientras otra
+        se descarga en segundo plano. Si todavía no hay ninguna versión con
+        filas, el pedido espera la carga como la primera vez.
+        """
+        if name in self.eager:
+            dataset = self.current()
+            return dataset.frames[list(SHEET_GIDS).index(name)], dataset.version
+        lock = self._sheet_locks[name]
+        entry = self._sheets.get(name)
+        if entry is None or (entry.df.empty and time.time() > entry.expires_at):
+            with lock:
+                entry = self._sheets.get(name)
+                if entry is None or (entry.df.empty and time.time() > entry.expires_at):
+                    entry = self._load_sheet(name)
+        elif time.time() > entry.expires_at and lock.acquire(blocking=False):
+            # Una sola recarga en curso por hoja: el hilo libera el lock al terminar
+            threading.Thread(target=self._reload_sheet, args=(name, lock), daemon=True, name=f"hoja-{name}").start()
+        return entry.df, entry.version
+
+    def _load_sheet(self, name):
+        try:
+            with span("hoja", hoja=name):
+                df, fallidas = self.source.load_sheet(name, self.store)
+        except Exception:
+            logger.exception("Error cargando la hoja %s", name)
+            df, fallidas = pd.DataFrame(), [name]
+        now = time.time()
+        previous = self._sheets.get(name)
+        if df.empty and previous is not None and not previous.df.empty:
+            # Carga fallida o vacía: se mantiene la anterior
+            df, fallidas = previous.df, fallidas or [name]
+        ok = not fallidas and not df.empty
+        entry = SheetEntry(df, now, now + (self.ttl.get(name, self.interval) if ok else SHEET_RETRY), tuple(fallidas))
+        self._sheets[name] = entry
+        return entry
+
+    def _reload_sheet(self, name, lock):
+        try:
+            self._load_sheet(name)
+        finally:
+            lock.release()
+
+    def _loop(self, delay):
+        time.sleep(delay)
+        while True:
+            self.refresh()
+            time.sleep(self.interval)
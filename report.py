@@ -0,0 +1,228 @@
+import hashlib
+import io
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+import plotly.express as px
+from fpdf import FPDF
+
+from charts import PROD_COLORS, TIPO_COLORS, pie_tiempos, produccion_por_maquina, render_png, tiempos_por_tipo, top_fallas
+
+REPORT_AREAS = ("Estampado", "Soldadura")
+PERIOD_TYPES = ("Diario", "Semanal", "Mensual")
+OEE_SHEETS = {"Diario": "oee_diario", "Semanal": "oee_sem", "Mensual": "oee_men"}
+
+# Subir cuando cambie el contenido o el diseño del PDF: invalida la caché
+REPORT_LAYOUT_VERSION = 1
+
+_PERIOD_COLUMN = {"Semanal": "semana", "Mensual": "mes"}
+_PERIOD_LABEL = {"Diario": "Día", "Semanal": "Semana", "Mensual": "Mes"}
+
+
+# ==========================================
+# PERÍODOS DEL REPORTE
+# ==========================================
+@dataclass
+class Period:
+    tipo: str
+    valor: object
+    label: str
+    oee_target: pd.DataFrame
+    ini: Optional[pd.Timestamp] = None
+    fin: Optional[pd.Timestamp] = None
+
+    @property
+    def key(self):
+        return (self.tipo, self.valor)
+
+
+def period_column(df_oee, tipo):
+    return next((c for c in df_oee.columns if _PERIOD_COLUMN[tipo] in c.lower()), df_oee.columns[0])
+
+
+def period_options(df_oee, tipo):
+    """Semanas o meses disponibles en la hoja OEE correspondiente."""
+    if df_oee.empty: return []
+    return [s for s in df_oee[period_column(df_oee, tipo)].unique() if s.strip() != ""]
+
+
+def resolve_period(tipo, valor, df_oee):
+    """Filas OEE, rango de fechas y etiqueta de un día, semana o mes."""
+    if tipo == "Diario":
+        ini = pd.Timestamp(valor)
+        target = df_oee[df_oee['Fecha_Filtro'] == ini] if 'Fecha_Filtro' in df_oee.columns else df_oee.iloc[:0]
+        return Period(tipo, ini, f"Día {ini.strftime('%d-%m-%Y')}", target, ini, ini)
+
+    target = df_oee[df_oee[period_column(df_oee, tipo)] == valor]
+    periodo = Period(tipo, valor, f"{_PERIOD_LABEL[tipo]} {valor}", target)
+    col_ini = next((c for c in target.columns if 'inicio' in c.lower()), None)
+    col_fin = next((c for c in target.columns if 'fin' in c.lower()), None)
+    if col_ini and col_fin and not target.empty:
+        periodo.ini = pd.to_datetime(target.iloc[0][col_ini], dayfirst=True, errors='coerce')
+        periodo.fin = pd.to_datetime(target.iloc[0][col_fin], dayfirst=True, errors='coerce')
+    return periodo
+
+
+def report_filename(area, label):
+    return f"{area}_{label.replace(' ', '_')}.pdf"
+
+
+def report_data_version(periodo, rollups):
+    """Hash de los datos que entran en el reporte de este período."""
+    parts = [periodo.oee_target]
+    if periodo.ini is not None and periodo.fin is not None:
+        parts += [rollups['datos'].window(periodo.ini, periodo.fin), rollups['prod'].window(periodo.ini, periodo.fin)]
+    h = hashlib.sha256()
+    for df in parts:
+        h.update("\x1f".join(map(str, df.columns)).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def report_key(cache, area, periodo, rollups):
+    return cache.key(area, periodo.label, report_data_version(periodo, rollups), REPORT_LAYOUT_VERSION)
+
+
+def cached_report(cache, area, periodo, metricas, rollups):
+    """PDF del período desde la caché en disco, o generado y guardado."""
+    key = report_key(cache, area, periodo, rollups)
+    pdf = cache.get(key)
+    if pdf is None:
+        pdf = crear_pdf(area, periodo.label, metricas, periodo.ini, periodo.fin, rollups)
+        cache.put(key, pdf)
+    return pdf
+
+
+# ==========================================
+# FUNCIONES DE PDF (FPDF)
+# ==========================================
+def clean_text(text):
+    if pd.isna(text): return "-"
+    return str(text).encode('latin-1', 'replace').decode('latin-1')
+
+
+def set_pdf_color(pdf, val):
+    if val < 0.85: pdf.set_text_color(220, 20, 20)
+    elif val <= 0.95: pdf.set_text_color(200, 150, 0)
+    else: pdf.set_text_color(33, 195, 84)
+
+
+def print_pdf_metric_row(pdf, prefix, m):
+    pdf.set_font("Arial", 'B', 10)
+    pdf.set_text_color(0, 0, 0)
+    pdf.write(6, clean_text(f"{prefix} | OEE: "))
+    set_pdf_color(pdf, m['OEE'])
+    pdf.write(6, f"{m['OEE']:.1%}")
+    
+    pdf.set_text_color(0, 0, 0)
+    pdf.write(6, clean_text(" | Disp: "))
+    set_pdf_color(pdf, m['DISP'])
+    pdf.write(6, f"{m['DISP']:.1%}")
+    
+    pdf.set_text_color(0, 0, 0)
+    pdf.write(6, clean_text(" | Perf: "))
+    set_pdf_color(pdf, m['PERF'])
+    pdf.write(6, f"{m['PERF']:.1%}")
+    
+    pdf.set_text_color(0, 0, 0)
+    pdf.write(6, clean_text(" | Calidad: "))
+    set_pdf_color(pdf, m['CAL'])
+    pdf.write(6, f"{m['CAL']:.1%}")
+    
+    pdf.set_text_color(0, 0, 0)
+    pdf.ln(6)
+
+
+def crear_pdf(area, label_reporte, metricas_pdf, ini_date, fin_date, rollups, progress=None):
+    # `progress(fracción, paso)` informa el avance a quien encoló el reporte
+    avance = progress or (lambda frac, paso: None)
+    avance(0.0, "Preparando datos")
+
+    # Sumas diarias del rango y del área; el filtro se resuelve en el rollup (o en la base)
+    if ini_date is not None and fin_date is not None:
+        df_pdf = rollups['datos'].window(ini_date, fin_date, contains={'Fábrica': area})
+        df_prod_pdf = pd.DataFrame()
+        if not rollups['prod'].empty:
+            # Producción: máquinas que nombran al área o que tuvieron eventos en ella
+            por_nombre = rollups['prod'].window(ini_date, fin_date, contains={'Máquina': area})
+            por_eventos = rollups['prod'].window(ini_date, fin_date, {'Máquina': [str(m) for m in df_pdf['Máquina'].unique()]})
+            df_prod_pdf = pd.concat([por_nombre, por_eventos]).drop_duplicates()
+    else:
+        # Fallback si el reporte no tiene fechas
+        df_pdf = rollups['datos'].empty_window()
+        df_prod_pdf = pd.DataFrame()
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(0, 10, clean_text(f"Reporte de Indicadores - {area.upper()}"), ln=True, align='C')
+    pdf.set_font("Arial", size=10)
+    pdf.cell(0, 10, clean_text(f"Período del Reporte: {label_reporte}"), ln=True, align='C')
+    pdf.ln(5)
+
+    # 1. OEE DEL ÁREA Y MÁQUINAS
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 10, clean_text("1. Resumen General y OEE"), ln=True)
+    
+    metrics_area = metricas_pdf[area.upper()]
+    print_pdf_metric_row(pdf, f"General {area.upper()}", metrics_area)
+    
+    pdf.ln(2)
+    pdf.set_font("Arial", 'B', 10)
+    pdf.cell(0, 6, clean_text("Detalle OEE por Máquina/Línea:"), ln=True)
+    lineas = ['L1', 'L2', 'L3', 'L4'] if area.upper() == 'ESTAMPADO' else ['CELDA', 'PRP']
+    for l in lineas:
+        m_l = metricas_pdf[l]
+        print_pdf_metric_row(pdf, f"   -> {l} ", m_l)
+    pdf.ln(5)
+
+    # 2. ANÁLISIS DE FALLAS
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 10, clean_text("2. Análisis de Fallas"), ln=True)
+    avance(0.2, "Gráfico de fallas")
+    top_fallas_area = top_fallas(df_pdf, 10)
+    
+    if not top_fallas_area.empty:
+        fig_fallas = px.bar(top_fallas_area, x='Nivel Evento 6', y='Tiempo (Min)', title=f"Top 10 Fallas - {area}", color='Tiempo (Min)', color_continuous_scale='Reds', text='Tiempo (Min)')
+        fig_fallas.update_traces(texttemplate='%{text:.1f}', textposition='outside', cliponaxis=False)
+        fig_fallas.update_layout(width=800, height=450, margin=dict(t=80, b=150, l=40, r=40))
+        
+        pdf.image(io.BytesIO(render_png(fig_fallas)), w=170)
+        pdf.ln(5)
+    else:
+        pdf.set_font("Arial", '', 10)
+        pdf.cell(0, 8, clean_text("No hay datos detallados de fallas para este período."), ln=True)
+
+    # 3. PRODUCCIÓN VS PARADA
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 10, clean_text("3. Relación Producción vs Parada"), ln=True)
+    avance(0.5, "Gráfico de tiempos")
+    if not df_pdf.empty:
+        fig_pie = pie_tiempos(tiempos_por_tipo(df_pdf), color='Tipo', color_discrete_map=TIPO_COLORS)
+        fig_pie.update_layout(width=500, height=350, margin=dict(t=30, b=20, l=20, r=20))
+        pdf.image(io.BytesIO(render_png(fig_pie)), w=110)
+    else:
+        pdf.set_font("Arial", '', 10)
+        pdf.cell(0, 8, clean_text("No hay datos de tiempos para este período."), ln=True)
+    pdf.ln(5)
+
+    # 4. PRODUCCIÓN POR MÁQUINA
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 10, clean_text("4. Producción por Máquina"), ln=True)
+    avance(0.7, "Gráfico de producción")
+    if not df_prod_pdf.empty and 'Buenas' in df_prod_pdf.columns:
+        prod_maq = produccion_por_maquina(df_prod_pdf, 'Máquina', ['Buenas', 'Retrabajo', 'Observadas'])
+        fig_prod = px.bar(prod_maq, x='Máquina', y=['Buenas', 'Retrabajo', 'Observadas'], barmode='stack', color_discrete_sequence=PROD_COLORS, text_auto=True)
+        fig_prod.update_layout(width=800, height=450, margin=dict(t=60, b=150, l=40, r=40))
+        
+        pdf.image(io.BytesIO(render_png(fig_prod)), w=170)
+    else:
+        pdf.set_font("Arial", '', 10)
+        pdf.cell(0, 8, clean_text("No hay datos de producción para este período."), ln=True)
+
+    # FINALIZAR: el PDF se genera directamente en memoria
+    avance(0.9, "Armando PDF")
+    return bytes(pdf.output())
@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from report import crear_pdf, report_filename, report_key
+from timing import span
+
+logger = logging.getLogger(__name__)
+
+REPORT_WORKERS = 2
+MAX_JOBS = 32
+
+PENDIENTE, GENERANDO, LISTO, ERROR = "pendiente", "generando", "listo", "error"
+
+
+@dataclass
+class ReportJob:
+    key: str
+    area: str
+    label: str
+    status: str = PENDIENTE
+    progress: float = 0.0
+    step: str = "En cola"
+    error: Optional[str] = None
+    pdf: Optional[bytes] = field(default=None, repr=False)
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def filename(self):
+        return report_filename(self.area, self.label)
+
+    @property
+    def done(self):
+        return self.status in (LISTO, ERROR)
+
+
+class ReportQueue:
+    """Cola de reportes PDF que se generan en hilos, fuera del script de Streamlit.
+
+    Un pedido igual a otro pendiente o terminado (misma clave de caché)
+    devuelve el mismo trabajo en lugar de encolar otro. Los trabajos
+    terminados conservan el PDF para descargarlo en reruns posteriores;
+    se guardan los últimos `max_jobs` y el PDF queda además en la caché
+    en disco.
+    """
+
+    def __init__(self, cache, workers=REPORT_WORKERS, max_jobs=MAX_JOBS):
+        self.cache = cache
+        self.max_jobs = max_jobs
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reporte-pdf")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, area, periodo, metricas, rollups):
+        key = report_key(self.cache, area, periodo, rollups)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != ERROR:
+                self._jobs.move_to_end(key)
+                return job
+            job = ReportJob(key, area, periodo.label)
+            self._jobs[key] = job
+            self._trim()
+
+        pdf = self.cache.get(key)
+        if pdf is not None:
+            self._finish(job, pdf=pdf)
+        else:
+            self._pool.submit(self._run, job, periodo, metricas, rollups)
+        return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def find(self, key, area, label):
+        """El trabajo `key`; si `_trim` ya lo descartó, se rearma desde la caché en disco."""
+        job = self.get(key)
+        if job is None and key is not None:
+            pdf = self.cache.get(key)
+            if pdf is not None:
+                job = ReportJob(key, area, label)
+                self._finish(job, pdf=pdf)
+        return job
+
+    def _run(self, job, periodo, metricas, rollups):
+        job.status = GENERANDO
+
+        def progress(frac, paso):
+            job.progress, job.step = frac, paso
+
+        try:
+            with span("pdf", area=job.area, periodo=job.label):
+                pdf = crear_pdf(job.area, job.label, metricas, periodo.ini, periodo.fin, rollups, progress=progress)
+            self.cache.put(job.key, pdf)
+            self._finish(job, pdf=pdf)
+        except Exception as e:
+            logger.exception("Error generando el PDF %s", job.filename)
+            self._finish(job, error=str(e))
+
+    def _finish(self, job, pdf=None, error=None):
+        job.pdf, job.error = pdf, error
+        job.progress, job.step = 1.0, "Listo" if error is None else "Error"
+        job.finished_at = time.time()
+        job.status = LISTO if error is None else ERROR
+
+    def _trim(self):
+        # Solo se descartan trabajos terminados, del más viejo al más nuevo
+        for key in [k for k, j in self._jobs.items() if j.done][:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[key]
@@ -0,0 +1,326 @@
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+import requests
+from pandas.tseries.api import guess_datetime_format
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from timing import record
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# HOJAS DEL SPREADSHEET (nombre -> gid)
+# ==========================================
+SHEET_GIDS = {
+    "datos": "0",
+    "oee_diario": "1767654796",
+    "prod": "315437448",
+    "operarios": "354131379",
+    "oee_sem": "2079886194",
+    "oee_men": "1696631148",
+}
+
+# Timeout (conexión, lectura) por hoja y plazo total de la descarga
+FETCH_TIMEOUT = (5, 30)
+FETCH_DEADLINE = 60
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 0.5
+
+
+@dataclass
+class FetchResult:
+    name: str
+    content: Optional[bytes] = None
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def ok(self):
+        return self.content is not None
+
+
+def export_base(url_base):
+    return url_base.split("/edit")[0] + "/export?format=csv&gid="
+
+
+# ==========================================
+# SESIÓN HTTP COMPARTIDA
+# ==========================================
+_session = None
+_session_lock = threading.Lock()
+
+
+def build_session(pool_size=len(SHEET_GIDS), retries=FETCH_RETRIES, backoff=FETCH_BACKOFF):
+    retry = Retry(
+        total=retries, connect=retries, read=retries, backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(["GET"]),
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = build_session()
+        return _session
+
+
+# ==========================================
+# DESCARGA CONCURRENTE
+# ==========================================
+def fetch_sheet(session, name, url, timeout=FETCH_TIMEOUT):
+    t0 = time.perf_counter()
+    try:
+        resp = session.get(url, timeout=timeout)
+        resp.raise_for_status()
+        return FetchResult(name, resp.content, time.perf_counter() - t0)
+    except Exception as e:
+        return FetchResult(name, None, time.perf_counter() - t0, str(e))
+
+
+def fetch_sheets(url_base, gids=None, session=None, timeout=FETCH_TIMEOUT, deadline=FETCH_DEADLINE):
+    """Descarga todas las hojas en paralelo y devuelve {nombre: FetchResult}.
+
+    Una hoja que falla o no termina antes de `deadline` queda con error y sin
+    contenido; el resto se devuelve igual.
+    """
+    gids = SHEET_GIDS if gids is None else gids
+    session = session or get_session()
+    base = export_base(url_base)
+
+    pool = ThreadPoolExecutor(max_workers=len(gids), thread_name_prefix="fetch")
+    futures = {pool.submit(fetch_sheet, session, name, base + gid, timeout): name for name, gid in gids.items()}
+    t0 = time.perf_counter()
+    done, _ = wait(futures, timeout=deadline)
+    # No esperamos a las descargas colgadas: sus hilos terminan solos por timeout
+    pool.shutdown(wait=False)
+
+    results = {}
+    for fut, name in futures.items():
+        if fut in done:
+            results[name] = fut.result()
+        else:
+            results[name] = FetchResult(name, None, time.perf_counter() - t0, f"sin respuesta en {deadline}s")
+    for r in results.values():
+        record("descarga", r.seconds, hoja=r.name, bytes=len(r.content) if r.ok else 0, ok=r.ok)
+        if r.ok:
+            logger.info("hoja %s: %d bytes en %.2fs", r.name, len(r.content), r.seconds)
+        else:
+            logger.warning("hoja %s falló en %.2fs: %s", r.name, r.seconds, r.error)
+    return {name: results[name] for name in gids}
+
+
+# ==========================================
+# ESQUEMA DE CADA HOJA
+# ==========================================
+NUMERIC_COLUMNS = ('Tiempo (Min)', 'Buenas', 'Retrabajo', 'Observadas', 'OEE', 'Disponibilidad', 'Performance', 'Calidad', 'Eficiencia')
+TEXT_COLUMNS = ('Código', 'Nombre', 'Inicio', 'Fin', 'Desde', 'Hasta', 'Semana', 'Mes')
+
+
+@dataclass(frozen=True)
+class SheetSchema:
+    """Tipos declarados de una hoja.
+
+    Cada nombre se busca como subcadena (sin mayúsculas) en los encabezados;
+    una columna toma el primer tipo que la reclama: numérico, categórico, texto.
+    Las categóricas son los textos de pocos valores distintos; `float_dtype`
+    es float32 en las hojas grandes y float64 donde importa el redondeo (OEE).
+    Con `usecols` solo se leen esas columnas (más la fecha) y con `chunk_rows`
+    el CSV se procesa por bloques, para acotar la memoria en hojas grandes.
+    """
+    name: str
+    categorical: tuple = ()
+    numeric: tuple = NUMERIC_COLUMNS
+    text: tuple = TEXT_COLUMNS
+    float_dtype: str = 'float32'
+    usecols: tuple = ()
+    chunk_rows: Optional[int] = None
+
+    def resolve(self, columns):
+        kinds = {}
+        for kind, specs in (('numeric', self.numeric), ('category', self.categorical), ('text', self.text)):
+            for spec in specs:
+                for col in columns:
+                    if col not in kinds and spec.lower() in col.lower():
+                        kinds[col] = kind
+        return kinds
+
+    def keeps(self, col):
+        if not self.usecols or find_date_column([col]):
+            return True
+        return col.strip().lower() in {spec.lower() for spec in self.usecols}
+
+
+_EVENT_CATEGORIES = ('Fábrica', 'Máquina', 'Evento', 'Nivel Evento 3', 'Nivel Evento 4', 'Nivel Evento 6', 'Operador')
+
+# Columnas de Datos que usan el dashboard y los PDF
+_EVENT_COLUMNS = ('Fábrica', 'Máquina', 'Evento', 'Nivel Evento 3', 'Nivel Evento 6', 'Tiempo (Min)')
+
+SHEET_SCHEMAS = {
+    "datos": SheetSchema("datos", categorical=_EVENT_CATEGORIES, usecols=_EVENT_COLUMNS, chunk_rows=200_000),
+    "oee_diario": SheetSchema("oee_diario", categorical=('Fábrica', 'Máquina'), float_dtype='float64'),
+    "prod": SheetSchema("prod", categorical=('Fábrica', 'Máquina')),
+    "operarios": SheetSchema("operarios", categorical=('Fábrica', 'Máquina', 'Operador')),
+    "oee_sem": SheetSchema("oee_sem", categorical=('Fábrica', 'Máquina'), float_dtype='float64'),
+    "oee_men": SheetSchema("oee_men", categorical=('Fábrica', 'Máquina'), float_dtype='float64'),
+}
+
+
+def _is_text(s):
+    return pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)
+
+
+def parse_numeric(s, dtype='float32'):
+    # "12,5%" -> 12.5; el camino rápido es un cast directo y solo si hay
+    # valores no numéricos se cae a to_numeric(errors='coerce')
+    if not pd.api.types.is_numeric_dtype(s):
+        s = s.astype(str).str.replace(',', '.', regex=False).str.replace('%', '', regex=False)
+        try:
+            s = s.astype('float64')
+        except (TypeError, ValueError):
+            s = pd.to_numeric(s, errors='coerce')
+    return s.fillna(0.0).astype(dtype)
+
+
+def find_date_column(columns):
+    return next((c for c in columns if 'fecha' in c.lower() and 'inicio' not in c.lower() and 'fin' not in c.lower()), None)
+
+
+class _PartsReader(io.RawIOBase):
+    """Lectura secuencial de varios buffers sin unirlos en un bytes nuevo."""
+
+    def __init__(self, parts):
+        self._parts = [memoryview(p).cast('B') for p in parts]
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._parts and not len(self._parts[0]):
+            self._parts.pop(0)
+        if not self._parts:
+            return 0
+        n = min(len(b), len(self._parts[0]))
+        b[:n] = self._parts[0][:n]
+        self._parts[0] = self._parts[0][n:]
+        return n
+
+
+def csv_stream(content):
+    """Archivo de lectura sobre el CSV: bytes, memoryview o tupla de partes."""
+    parts = content if isinstance(content, tuple) else (content,)
+    return io.BufferedReader(_PartsReader(parts), buffer_size=1 << 20)
+
+
+def memory_bytes(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _clean(df, schema, kinds, col_fecha, date_format=None):
+    if col_fecha:
+        # Se parsea cada fecha distinta una sola vez (en orden de aparición, para
+        # que la inferencia de formato sea la misma que sobre la columna entera)
+        codes, uniques = pd.factorize(df[col_fecha])
+        if date_format:
+            parsed = pd.to_datetime(pd.Series(uniques), format=date_format, errors='coerce')
+        else:
+            parsed = pd.to_datetime(pd.Series(uniques), dayfirst=True, errors='coerce')
+        df['Fecha_Filtro'] = parsed.dt.normalize().reindex(codes).to_numpy()
+        if _is_text(df[col_fecha]):
+            df[col_fecha] = pd.Categorical.from_codes(codes, categories=uniques.astype(str))
+        df = df.dropna(subset=['Fecha_Filtro'])
+
+    for col, kind in kinds.items():
+        if kind == 'numeric':
+            df[col] = parse_numeric(df[col], schema.float_dtype)
+        elif _is_text(df[col]):
+            df[col] = df[col].fillna('').astype(str)
+            if kind == 'category':
+                df[col] = df[col].astype('category')
+    return df
+
+
+def _first_date_format(s):
+    # Mismo criterio que pandas sobre la columna entera: el primer valor no nulo
+    first = s.dropna()
+    return guess_datetime_format(str(first.iloc[0]), dayfirst=True) if len(first) else None
+
+
+def _read_chunks(content, schema):
+    """Lee y limpia el CSV bloque a bloque; solo un bloque crudo vive en memoria."""
+    columns = pd.read_csv(csv_stream(content), usecols=schema.keeps, nrows=0).columns
+    kinds = schema.resolve(columns)
+    col_fecha = find_date_column(columns)
+    # Los textos se leen como texto en todos los bloques, aunque alguno venga
+    # vacío o solo con números, para que las categorías se puedan unir
+    dtype = {col: str for col, kind in kinds.items() if kind != 'numeric'}
+    reader = pd.read_csv(csv_stream(content), usecols=schema.keeps, dtype=dtype, chunksize=schema.chunk_rows)
+    parts, raw_rows, mem_raw, mem_chunk = [], 0, 0, 0
+    date_format = None
+    for chunk in reader:
+        if not parts and col_fecha:
+            date_format = _first_date_format(chunk[col_fecha])
+        raw_rows += len(chunk)
+        # Total crudo (comparable con la hoja sin bloques) y pico de un bloque
+        chunk_bytes = memory_bytes(chunk)
+        mem_raw += chunk_bytes
+        mem_chunk = max(mem_chunk, chunk_bytes)
+        parts.append(_clean(chunk, schema, kinds, col_fecha, date_format))
+    if not parts:
+        return pd.DataFrame(), 0, 0, 0
+    return concat_frames(parts), raw_rows, mem_raw, mem_chunk
+
+
+def process_df(content, schema=None):
+    """CSV crudo -> DataFrame tipado según `schema` con `Fecha_Filtro` normalizada.
+
+    `content` puede ser bytes, un memoryview o una tupla de partes (por
+    ejemplo encabezado y cola) que se leen en orden sin copiarlas.
+    """
+    if content is None: return pd.DataFrame()
+    schema = schema or SheetSchema("hoja")
+    t0 = time.perf_counter()
+    if schema.chunk_rows:
+        try:
+            df, raw_rows, mem_before, mem_chunk = _read_chunks(content, schema)
+        except Exception: return pd.DataFrame()
+    else:
+        try:
+            df = pd.read_csv(csv_stream(content), usecols=schema.keeps)
+        except Exception: return pd.DataFrame()
+        raw_rows, mem_before, mem_chunk = len(df), memory_bytes(df), None
+        df = _clean(df, schema, schema.resolve(df.columns), find_date_column(df.columns))
+
+    # Filas leídas del CSV, incluidas las descartadas por fecha inválida
+    df.attrs["raw_rows"] = raw_rows
+    extra = {} if mem_chunk is None else {"mem_bloque_max": mem_chunk}
+    record("parseo", time.perf_counter() - t0, hoja=schema.name, filas=len(df),
+           mem_antes=mem_before, mem_despues=memory_bytes(df), **extra)
+    return df
+
+
+def concat_frames(frames):
+    """Concatena hojas procesadas conservando las columnas categóricas."""
+    frames = [f for f in frames if not f.empty] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            cats = frames[0][col].cat.categories
+            for f in frames[1:]:
+                cats = cats.union(f[col].cat.categories)
+            frames = [f.assign(**{col: f[col].cat.set_categories(cats)}) for f in frames]
+    return pd.concat(frames)
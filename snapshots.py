@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from sheets import concat_frames, process_df
+from timing import count, record
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.environ.get("INDICADORES_SNAPSHOT_DIR", ".snapshots")
+
+# Filas finales del CSV que se re-parsean en cada refresco (ventana reciente)
+RECENT_ROWS = 5000
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def split_point(content, tail_rows=RECENT_ROWS):
+    """Offset del inicio de las últimas `tail_rows` líneas del CSV.
+
+    Solo corta en un salto de línea con comillas balanceadas antes, para no
+    partir un campo multilínea. Nunca corta dentro del encabezado.
+    """
+    header_end = content.find(b'\n') + 1
+    if header_end <= 0:
+        return len(content)
+    # Sin rstrip: no se copia el CSV para ignorar los saltos finales
+    pos = len(content)
+    while pos > header_end and content[pos - 1] == 0x0A:
+        pos -= 1
+    for _ in range(tail_rows):
+        pos = content.rfind(b'\n', header_end, pos)
+        if pos < 0:
+            return header_end
+    while pos >= header_end and content.count(b'"', 0, pos) % 2:
+        pos = content.rfind(b'\n', header_end, pos)
+    return pos + 1 if pos >= header_end else header_end
+
+
+class SnapshotStore:
+    """Copia local en Parquet de las hojas ya procesadas por `process_df`.
+
+    Junto a cada hoja se guarda el hash del CSV completo y el de su prefijo
+    estable (todo menos las últimas RECENT_ROWS filas). Al refrescar:
+    hash igual -> se usa la copia; prefijo igual -> solo se parsea la cola y
+    se une a las filas ya procesadas; si no, se reprocesa todo.
+    """
+
+    def __init__(self, root=SNAPSHOT_DIR, tail_rows=RECENT_ROWS):
+        self.root = root
+        self.tail_rows = tail_rows
+        # Un lock por hoja: reprocesar Datos no frena la primera carga de otra hoja
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, name):
+        with self._locks_guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _paths(self, name):
+        return os.path.join(self.root, f"{name}.parquet"), os.path.join(self.root, f"{name}.json")
+
+    def load(self, name):
+        data_path, meta_path = self._paths(name)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            return pd.read_parquet(data_path), meta
+        except Exception:
+            return None, None
+
+    def load_all(self, names):
+        """Todas las hojas desde disco, o None si falta alguna."""
+        frames = []
+        for name in names:
+            df, _ = self.load(name)
+            if df is None:
+                return None
+            frames.append(df)
+        return tuple(frames)
+
+    def save(self, name, df, meta):
+        os.makedirs(self.root, exist_ok=True)
+        data_path, meta_path = self._paths(name)
+        # Escritura atómica: un lector nunca ve un archivo a medias
+        df.to_parquet(data_path + ".tmp")
+        os.replace(data_path + ".tmp", data_path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def refresh(self, name, content, schema=None):
+        """Devuelve la hoja procesada reconciliando el CSV nuevo con la copia local."""
+        with self._lock(name):
+            old_df, meta = self.load(name)
+            if content is None:
+                # Descarga fallida: se sirve la última copia buena
+                return old_df if old_df is not None else pd.DataFrame()
+
+            digest = _digest(content)
+            # Un cambio de esquema (columnas, tipos) invalida la copia local entera
+            schema_id = _digest(repr(schema).encode())
+            if meta and meta.get("schema") != schema_id:
+                meta = None
+            unchanged = bool(meta) and meta["sha256"] == digest
+            count("snapshot", hit=unchanged)
+            if unchanged:
+                return old_df
+
+            t0 = time.perf_counter()
+            # Vistas sobre la descarga: prefijo y cola se leen sin copiar el CSV
+            view = memoryview(content)
+            header = view[:content.find(b'\n') + 1]
+            prefix_len = meta["prefix_len"] if meta else 0
+            incremental = (
+                meta is not None and len(content) >= prefix_len
+                and _digest(view[:prefix_len]) == meta["prefix_sha256"]
+                and content.count(b'\n', prefix_len) <= 4 * self.tail_rows
+            )
+            if incremental:
+                base = old_df.iloc[:meta["prefix_rows"]]
+                prefix_raw_rows = meta["prefix_raw_rows"]
+                tail = view[prefix_len:]
+            else:
+                prefix_len = split_point(content, self.tail_rows)
+                prefix = process_df(view[:prefix_len], schema)
+                prefix_raw_rows = prefix.attrs.get("raw_rows", len(prefix))
+                base = prefix
+                tail = view[prefix_len:]
+
+            df_tail = process_df((header, tail), schema)
+            # Índice continuo, como si toda la hoja se hubiese leído de una vez
+            df_tail.index = df_tail.index + prefix_raw_rows
+            df = concat_frames([base, df_tail])
+            df.attrs["raw_rows"] = prefix_raw_rows + df_tail.attrs.get("raw_rows", len(df_tail))
+
+            last = df['Fecha_Filtro'].max() if 'Fecha_Filtro' in df.columns and not df.empty else None
+            self.save(name, df, {
+                "sha256": digest,
+                "schema": schema_id,
+                "prefix_len": prefix_len,
+                "prefix_sha256": _digest(view[:prefix_len]),
+                "prefix_rows": len(base),
+                "prefix_raw_rows": prefix_raw_rows,
+                "rows": len(df),
+                "last_fecha": None if last is None or pd.isna(last) else last.isoformat(),
+                "saved_at": time.time(),
+            })
+            logger.info("snapshot %s: %s, %d filas en %.2fs", name, "cola" if incremental else "completa", len(df), time.perf_counter() - t0)
+            record("snapshot", time.perf_counter() - t0, hoja=name, modo="cola" if incremental else "completa")
+            return df
@@ -0,0 +1,278 @@
+"""Orígenes de datos: Google Sheets, un directorio de CSV o una base SQLite.
+
+Google Sheets y el directorio de CSV entregan el CSV crudo de cada hoja y
+pasan por la misma ingesta (copia local incremental, esquema, índices en
+memoria). SQLite guarda las hojas ya procesadas y resuelve en la base los
+rangos de fechas, los filtros de Fábrica/Máquina y las sumas diarias de
+Datos y Producción: a Python solo llega la ventana pedida.
+
+Para llenar (o extender) la base desde la copia local:
+    python sources.py archivar --db eventos.db
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+import pandas as pd
+
+from dataset import DATE_COL, EVENT_KEYS, EVENT_VALUES, PROD_KEYS, PROD_VALUES, DateIndex, index_sheets, reconcile_sheets, resolve_columns
+from sheets import SHEET_GIDS, SHEET_SCHEMAS, FetchResult, fetch_sheets
+from snapshots import SNAPSHOT_DIR, SnapshotStore
+from timing import span
+
+SOURCE_TYPES = ("spreadsheet", "csv", "sqlite")
+
+
+# ==========================================
+# HOJAS COMO CSV (GOOGLE SHEETS / DIRECTORIO)
+# ==========================================
+class SheetsSource:
+    """Las seis hojas exportadas como CSV desde el spreadsheet."""
+    kind = "spreadsheet"
+    snapshots = True
+
+    def __init__(self, url_base):
+        self.location = url_base
+
+    def fetch(self, names=tuple(SHEET_GIDS)):
+        return fetch_sheets(self.location, {name: SHEET_GIDS[name] for name in names})
+
+    def load(self, store, names=tuple(SHEET_GIDS)):
+        """Las hojas `names` indexadas; las demás quedan vacías."""
+        frames, fallidas = reconcile_sheets(self, store, names)
+        loaded = dict(zip(names, frames))
+        return index_sheets([loaded.get(name, pd.DataFrame()) for name in SHEET_GIDS]), fallidas
+
+    def load_sheet(self, name, store):
+        frames, fallidas = reconcile_sheets(self, store, (name,))
+        return frames[0], fallidas
+
+
+class CsvDirSource(SheetsSource):
+    """Un directorio con un CSV por hoja: datos.csv, oee_diario.csv, ..."""
+    kind = "csv"
+
+    def fetch(self, names=tuple(SHEET_GIDS)):
+        results = {}
+        for name in names:
+            t0 = time.perf_counter()
+            try:
+                with open(os.path.join(self.location, f"{name}.csv"), "rb") as f:
+                    results[name] = FetchResult(name, f.read(), time.perf_counter() - t0)
+            except OSError as e:
+                results[name] = FetchResult(name, None, time.perf_counter() - t0, str(e))
+        return results
+
+
+# ==========================================
+# SQLITE CON CONSULTAS EN LA BASE
+# ==========================================
+def _q(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _day(ts):
+    return pd.Timestamp(ts).strftime("%Y-%m-%d")
+
+
+class SqliteSource:
+    """Base SQLite con una tabla por hoja, escrita por `archive_sqlite`.
+
+    Las hojas OEE y Operarios se leen enteras (una fila por día y línea);
+    Datos y Producción quedan en la base y se consultan por ventana.
+    """
+    kind = "sqlite"
+    snapshots = False
+
+    def __init__(self, path):
+        self.location = path
+
+    def query(self, sql, params=()):
+        # Conexión de solo lectura por consulta: sirve desde cualquier hilo
+        with closing(sqlite3.connect(f"file:{self.location}?mode=ro", uri=True)) as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def columns(self, table):
+        info = self.query(f"PRAGMA table_info({_q(table)})")
+        return list(info["name"]) if "name" in info.columns else []
+
+    def read_sheet(self, name):
+        cols = self.columns(name)
+        if not cols:
+            raise LookupError(f"no existe la tabla {name}")
+        order = f" ORDER BY {_q(DATE_COL)}" if DATE_COL in cols else ""
+        return restore_types(self.query(f"SELECT * FROM {_q(name)}{order}"), SHEET_SCHEMAS[name])
+
+    def load_sheet(self, name, store=None):
+        try:
+            return self.read_sheet(name), []
+        except Exception:
+            return pd.DataFrame(), [name]
+
+    def load(self, store=None, names=tuple(SHEET_GIDS)):
+        frames, fallidas = {}, []
+        for name in SHEET_GIDS:
+            if name in ("datos", "prod") or name not in names:
+                frames[name] = pd.DataFrame()
+                continue
+            frames[name], fallo = self.load_sheet(name)
+            fallidas += fallo
+        rollups = {
+            'datos': SqlRollup(self, 'datos', EVENT_KEYS, EVENT_VALUES),
+            'prod': SqlRollup(self, 'prod', PROD_KEYS, PROD_VALUES),
+        }
+        fallidas += [name for name, r in rollups.items() if r.missing]
+        return (tuple(frames.values()), {'datos': rollups['datos'].index}, rollups), fallidas
+
+
+class SqlRollup:
+    """Misma interfaz que DailyRollup, resuelta con GROUP BY en la base."""
+
+    def __init__(self, source, table, keys, values):
+        self.source = source
+        self.table = table
+        columns = source.columns(table)
+        self.missing = not columns
+        self.keys = resolve_columns(columns, keys)
+        self.values = resolve_columns(columns, values)
+        self.empty = (
+            self.missing or DATE_COL not in columns or not self.values
+            or source.query(f"SELECT 1 FROM {_q(table)} LIMIT 1").empty
+        )
+        # Índice sobre el catálogo día x fábrica x máquina, como el de DailyRollup
+        self.index = DateIndex(self.catalog())
+
+    def _select(self, where="", params=()):
+        by = ", ".join(_q(c) for c in [DATE_COL] + self.keys)
+        sums = ", ".join(f"SUM({_q(v)}) AS {_q(v)}" for v in self.values)
+        with span("sql", tabla=self.table):
+            df = self.source.query(f"SELECT {by}, {sums} FROM {_q(self.table)} {where} GROUP BY {by} ORDER BY {by}", params)
+        df[DATE_COL] = pd.to_datetime(df[DATE_COL])
+        for k in self.keys:
+            df[k] = df[k].astype(str).astype('category')
+        for v in self.values:
+            df[v] = df[v].astype('float64')
+        return df
+
+    def window(self, ini, fin, filters=None, contains=None):
+        if self.empty:
+            return self.empty_window()
+        where, params = [], []
+        if ini is not None and fin is not None:
+            if pd.isna(ini) or pd.isna(fin):
+                return self.empty_window()
+            where.append(f"{_q(DATE_COL)} BETWEEN ? AND ?")
+            params += [_day(ini), _day(fin)]
+        for col, values in (filters or {}).items():
+            values = [str(v) for v in values]
+            if not values:
+                return self.empty_window()
+            where.append(f"{_q(col)} IN ({', '.join('?' * len(values))})")
+            params += values
+        for col, text in (contains or {}).items():
+            # LIKE de SQLite ignora mayúsculas (ASCII); se escapan sus comodines
+            where.append(f"{_q(col)} LIKE ? ESCAPE '\\'")
+            params.append("%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        return self._select("WHERE " + " AND ".join(where) if where else "", params)
+
+    def empty_window(self):
+        if self.missing or not self.values:
+            return pd.DataFrame(columns=[DATE_COL] + self.keys + self.values)
+        return self._select("WHERE 0")
+
+    def catalog(self):
+        """Combinaciones distintas de día, Fábrica y Máquina, ordenadas por día."""
+        if self.empty:
+            return pd.DataFrame()
+        cols = [DATE_COL] + [k for k in ('Fábrica', 'Máquina') if k in self.keys]
+        by = ", ".join(_q(c) for c in cols)
+        df = self.source.query(f"SELECT DISTINCT {by} FROM {_q(self.table)} ORDER BY {by}")
+        df[DATE_COL] = pd.to_datetime(df[DATE_COL])
+        return df
+
+
+def restore_types(df, schema):
+    """Vuelve a los tipos de la ingesta (fecha, float, categorías) lo leído de SQLite."""
+    if DATE_COL in df.columns:
+        df[DATE_COL] = pd.to_datetime(df[DATE_COL])
+    for col, kind in schema.resolve(df.columns).items():
+        if kind == 'numeric':
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0).astype(schema.float_dtype)
+        elif kind == 'category':
+            df[col] = df[col].fillna('').astype(str).astype('category')
+    return df
+
+
+def archive_sqlite(frames, path):
+    """Guarda las hojas procesadas en SQLite, reemplazando los días que traen.
+
+    Las hojas con Fecha_Filtro conservan los días anteriores al primero de la
+    hoja nueva, así la base acumula historia aunque el spreadsheet no la tenga.
+    """
+    with closing(sqlite3.connect(path)) as conn:
+        for name, df in zip(SHEET_GIDS, frames):
+            if df.empty:
+                continue
+            out = df.reset_index(drop=True)
+            for col in out.columns:
+                if isinstance(out[col].dtype, pd.CategoricalDtype):
+                    out[col] = out[col].astype(str)
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()
+            if DATE_COL in out.columns:
+                desde = out[DATE_COL].min()
+                out[DATE_COL] = out[DATE_COL].dt.strftime("%Y-%m-%d")
+                if exists:
+                    conn.execute(f"DELETE FROM {_q(name)} WHERE {_q(DATE_COL)} >= ?", (_day(desde),))
+                out.to_sql(name, conn, if_exists="append", index=False)
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {_q('ix_' + name + '_fecha')} ON {_q(name)} ({_q(DATE_COL)})")
+            else:
+                out.to_sql(name, conn, if_exists="replace", index=False)
+        conn.commit()
+
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+def make_source(kind, location):
+    if kind == "csv":
+        return CsvDirSource(location)
+    if kind == "sqlite":
+        return SqliteSource(location)
+    return SheetsSource(location)
+
+
+def source_config(secrets):
+    """(tipo, ubicación) desde los secretos: la sección [source] o el spreadsheet."""
+    source = secrets.get("source")
+    if source:
+        if source["type"] not in SOURCE_TYPES:
+            raise ValueError(f"tipo de origen desconocido: {source['type']}")
+        if source["type"] != "spreadsheet":
+            return source["type"], source["path"]
+    return "spreadsheet", secrets["connections"]["gsheets"]["spreadsheet"].strip()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Herramientas de los orígenes de datos.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    arch = sub.add_parser("archivar", help="Copia la copia local de las hojas a una base SQLite.")
+    arch.add_argument("--db", required=True)
+    arch.add_argument("--snapshots", default=SNAPSHOT_DIR)
+    args = p.parse_args(argv)
+
+    # Se archiva lo que haya: las hojas bajo demanda pueden no tener copia todavía
+    store = SnapshotStore(args.snapshots)
+    frames = {name: store.load(name)[0] for name in SHEET_GIDS}
+    hojas = [name for name, df in frames.items() if df is not None]
+    if not hojas:
+        sys.exit(f"No hay copia local en {args.snapshots}.")
+    archive_sqlite([pd.DataFrame() if df is None else df for df in frames.values()], args.db)
+    print(f"Hojas archivadas en {args.db}: {', '.join(hojas)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
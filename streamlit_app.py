@@ -1,9 +1,17 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import tempfile
-import os
-from fpdf import FPDF
+import threading
+import time
+from snapshots import SnapshotStore
+from refresher import Dataset, DatasetRefresher
+from sources import make_source, source_config
+from metrics import MetricsEngine, all_metrics
+from charts import bar_top_fallas, payload_bytes, pie_tiempos, produccion_por_maquina, tiempos_por_tipo, top_fallas, warm_renderer
+from report import OEE_SHEETS, REPORT_AREAS, Period, period_options, resolve_period
+from pdf_cache import PdfCache
+import timing
+from report_jobs import ERROR, LISTO, ReportQueue
 
 # ==========================================
 # 1. CONFIGURACIÓN Y ESTILOS
@@ -22,68 +30,59 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Spans de este rerun para el panel de diagnóstico
+perf_run = timing.begin_run()
+perf_t0 = time.perf_counter()
+
 # ==========================================
 # 2. CARGA DE DATOS ROBUSTA
 # ==========================================
-@st.cache_data(ttl=300)
-def load_data():
-    try:
-        try:
-            url_base = st.secrets["connections"]["gsheets"]["spreadsheet"].strip()
-        except Exception:
-            st.error("⚠️ No se encontró la configuración de secretos (.streamlit/secrets.toml).")
-            return [pd.DataFrame()] * 6
-
-        gid_datos = "0"
-        gid_oee_diario = "1767654796"
-        gid_prod = "315437448"
-        gid_operarios = "354131379"
-        gid_oee_sem = "2079886194"
-        gid_oee_men = "1696631148"
-        
-        base_export = url_base.split("/edit")[0] + "/export?format=csv&gid="
-        
-        def process_df(url):
-            try:
-                df = pd.read_csv(url)
-            except Exception: return pd.DataFrame()
-            
-            cols_num = ['Tiempo (Min)', 'Buenas', 'Retrabajo', 'Observadas', 'OEE', 'Disponibilidad', 'Performance', 'Calidad', 'Eficiencia']
-            for c in cols_num:
-                matches = [col for col in df.columns if c.lower() in col.lower()]
-                for match in matches:
-                    df[match] = df[match].astype(str).str.replace(',', '.')
-                    df[match] = df[match].str.replace('%', '')
-                    df[match] = pd.to_numeric(df[match], errors='coerce').fillna(0.0)
-            
-            col_fecha = next((c for c in df.columns if 'fecha' in c.lower() and 'inicio' not in c.lower() and 'fin' not in c.lower()), None)
-            if col_fecha:
-                df['Fecha_DT'] = pd.to_datetime(df[col_fecha], dayfirst=True, errors='coerce')
-                df['Fecha_Filtro'] = df['Fecha_DT'].dt.normalize()
-                df = df.dropna(subset=['Fecha_Filtro'])
-            
-            cols_texto = ['Fábrica', 'Máquina', 'Evento', 'Código', 'Operador', 'Nivel Evento 3', 'Nivel Evento 4', 'Nivel Evento 6', 'Nombre', 'Inicio', 'Fin', 'Desde', 'Hasta', 'Semana', 'Mes']
-            for c_txt in cols_texto:
-                matches = [col for col in df.columns if c_txt.lower() in col.lower() and df[col].dtype == 'object']
-                for match in matches:
-                    df[match] = df[match].fillna('').astype(str)
-            return df
-
-        return (
-            process_df(base_export + gid_datos), 
-            process_df(base_export + gid_oee_diario), 
-            process_df(base_export + gid_prod), 
-            process_df(base_export + gid_operarios),
-            process_df(base_export + gid_oee_sem),
-            process_df(base_export + gid_oee_men)
-        )
-    except Exception as e:
-        st.error(f"Error cargando datos: {e}")
-        return [pd.DataFrame()] * 6
-
-df_raw, df_oee_diario, df_prod_raw, df_operarios_raw, df_oee_sem, df_oee_men = load_data()
-
-if df_raw.empty:
+@st.cache_resource
+def get_refresher(kind, location):
+    # Un solo refresco en segundo plano por proceso, compartido por todas las sesiones
+    return DatasetRefresher(make_source(kind, location), SnapshotStore()).start()
+
+try:
+    origen = source_config(st.secrets)
+except Exception:
+    st.error("⚠️ No se encontró la configuración de secretos (.streamlit/secrets.toml).")
+    origen = None
+
+refresher = get_refresher(*origen) if origen else None
+dataset = refresher.current() if refresher else Dataset.empty()
+date_idx, rollups = dataset.indexes, dataset.rollups
+
+versiones = {}
+
+def hoja(name):
+    # Las hojas semanales y mensuales se descargan recién cuando una vista las pide
+    if refresher is None:
+        return pd.DataFrame()
+    df, versiones[name] = refresher.versioned(name)
+    return df
+
+@st.cache_resource
+def start_chart_renderer():
+    # kaleido queda caliente en segundo plano para el primer "Preparar PDF"
+    threading.Thread(target=warm_renderer, daemon=True).start()
+
+start_chart_renderer()
+
+@st.cache_resource
+def get_report_queue():
+    # Una cola por proceso: los PDF se generan en hilos y sobreviven a los reruns
+    return ReportQueue(PdfCache())
+
+@st.cache_resource(max_entries=6)
+def get_metrics_engine(name, version, _df_oee):
+    # Un índice por carga de cada hoja OEE; la clave es (hoja, número de carga),
+    # así Streamlit no hashea la hoja entera en cada rerun
+    return MetricsEngine(_df_oee)
+
+def motor(name, df_oee):
+    return get_metrics_engine(name, versiones.get(name, 0), df_oee)
+
+if rollups['datos'].empty:
     st.warning("No hay datos cargados en la base principal.")
     st.stop()
 
@@ -92,58 +91,57 @@ if df_raw.empty:
 # ==========================================
 st.title("🏭 INDICADORES FAMMA")
 
+def estado_datos(dataset):
+    if dataset.age is None:
+        return f"Datos: {dataset.source} (actualizando en segundo plano)"
+    return f"Datos de hace {dataset.age / 60:.0f} min · última recarga en {dataset.refresh_seconds:.1f} s"
+
+st.caption(estado_datos(dataset))
+if dataset.fallidas:
+    st.warning(f"⚠️ No se pudieron descargar algunas hojas: {', '.join(dataset.fallidas)}")
+if refresher and refresher.last_error:
+    st.warning(f"⚠️ Falló la última recarga ({refresher.last_error}); se muestran los datos anteriores.")
+
 st.subheader("📊 1. Configuración del Dashboard")
 col_d1, col_d2, col_d3 = st.columns([1, 1, 2])
 
 with col_d1:
     tipo_informe = st.radio("Período a visualizar:", ["Diario", "Semanal", "Mensual"], horizontal=True, key="dash_tipo")
 
+# Rango de fechas disponible (lo usan el dashboard y el PDF diario)
+min_d, max_d = date_idx['datos'].first_day().date(), date_idx['datos'].last_day().date()
+
 ini_filtro, fin_filtro = None, None
 df_oee_target = pd.DataFrame()
+oee_engine = None
+periodo_key = None
 label_periodo = ""
+dash_periodo = None
 
 with col_d2:
+    # Mismas reglas de período que el PDF: report.period_options / resolve_period
+    dash_oee = hoja(OEE_SHEETS[tipo_informe])
     if tipo_informe == "Diario":
-        min_d, max_d = df_raw['Fecha_Filtro'].min().date() if not df_raw.empty else pd.to_datetime("today").date(), df_raw['Fecha_Filtro'].max().date() if not df_raw.empty else pd.to_datetime("today").date()
         fecha_sel = st.date_input("Día a analizar:", value=max_d, min_value=min_d, max_value=max_d, key="dash_date")
-        ini_filtro, fin_filtro = pd.to_datetime(fecha_sel), pd.to_datetime(fecha_sel)
-        df_oee_target = df_oee_diario[df_oee_diario['Fecha_Filtro'] == ini_filtro]
-        label_periodo = f"Día: {fecha_sel.strftime('%d-%m-%Y')}"
-
+        dash_periodo = resolve_period("Diario", fecha_sel, dash_oee)
+    elif dash_oee.empty:
+        st.warning(f"Datos {'semanales' if tipo_informe == 'Semanal' else 'mensuales'} no disponibles.")
     elif tipo_informe == "Semanal":
-        if not df_oee_sem.empty:
-            col_sem = next((c for c in df_oee_sem.columns if 'semana' in c.lower()), df_oee_sem.columns[0])
-            opciones_sem = [s for s in df_oee_sem[col_sem].unique() if s.strip() != ""]
-            sem_sel = st.selectbox("Semana a analizar:", opciones_sem, key="dash_sem")
-            df_oee_target = df_oee_sem[df_oee_sem[col_sem] == sem_sel]
-            label_periodo = f"Semana: {sem_sel}"
-            
-            col_ini = next((c for c in df_oee_target.columns if 'inicio' in c.lower()), None)
-            col_fin = next((c for c in df_oee_target.columns if 'fin' in c.lower()), None)
-            if col_ini and col_fin and not df_oee_target.empty:
-                ini_filtro = pd.to_datetime(df_oee_target.iloc[0][col_ini], dayfirst=True, errors='coerce')
-                fin_filtro = pd.to_datetime(df_oee_target.iloc[0][col_fin], dayfirst=True, errors='coerce')
-        else: st.warning("Datos semanales no disponibles.")
-
-    elif tipo_informe == "Mensual":
-        if not df_oee_men.empty:
-            col_mes = next((c for c in df_oee_men.columns if 'mes' in c.lower()), df_oee_men.columns[0])
-            opciones_mes = [m for m in df_oee_men[col_mes].unique() if m.strip() != ""]
-            mes_sel = st.selectbox("Mes a analizar:", opciones_mes, key="dash_mes")
-            df_oee_target = df_oee_men[df_oee_men[col_mes] == mes_sel]
-            label_periodo = f"Mes: {mes_sel}"
-            
-            col_ini = next((c for c in df_oee_target.columns if 'inicio' in c.lower()), None)
-            col_fin = next((c for c in df_oee_target.columns if 'fin' in c.lower()), None)
-            if col_ini and col_fin and not df_oee_target.empty:
-                ini_filtro = pd.to_datetime(df_oee_target.iloc[0][col_ini], dayfirst=True, errors='coerce')
-                fin_filtro = pd.to_datetime(df_oee_target.iloc[0][col_fin], dayfirst=True, errors='coerce')
-        else: st.warning("Datos mensuales no disponibles.")
+        sem_sel = st.selectbox("Semana a analizar:", period_options(dash_oee, "Semanal"), key="dash_sem")
+        dash_periodo = resolve_period("Semanal", sem_sel, dash_oee)
+    else:
+        mes_sel = st.selectbox("Mes a analizar:", period_options(dash_oee, "Mensual"), key="dash_mes")
+        dash_periodo = resolve_period("Mensual", mes_sel, dash_oee)
+
+if dash_periodo is not None:
+    ini_filtro, fin_filtro = dash_periodo.ini, dash_periodo.fin
+    df_oee_target, periodo_key, label_periodo = dash_periodo.oee_target, dash_periodo.key, dash_periodo.label
+    oee_engine = motor(OEE_SHEETS[tipo_informe], dash_oee)
 
 with col_d3:
-    opciones_fabricas = sorted(df_raw['Fábrica'].unique()) if not df_raw.empty else []
+    opciones_fabricas = sorted(date_idx['datos'].machines)
     fábricas = st.multiselect("Área / Fábrica:", opciones_fabricas, default=opciones_fabricas)
-    opciones_maquinas = sorted(df_raw[df_raw['Fábrica'].isin(fábricas)]['Máquina'].unique()) if not df_raw.empty else []
+    opciones_maquinas = date_idx['datos'].machines_for(fábricas)
     máquinas_globales = st.multiselect("Máquinas a incluir:", opciones_maquinas, default=opciones_maquinas)
 
 st.divider()
@@ -157,67 +155,40 @@ col_p1, col_p2, col_p3 = st.columns([1, 1, 2])
 with col_p1:
     pdf_tipo = st.radio("Período del PDF:", ["Diario", "Semanal", "Mensual"], horizontal=True, key="pdf_tipo")
 
-pdf_ini, pdf_fin = None, None
-pdf_df_oee_target = pd.DataFrame()
-pdf_label = ""
+pdf_oee = hoja(OEE_SHEETS[pdf_tipo])
+pdf_periodo = None
 
 with col_p2:
     if pdf_tipo == "Diario":
         pdf_fecha = st.date_input("Día para PDF:", value=max_d, min_value=min_d, max_value=max_d, key="pdf_date")
-        pdf_ini, pdf_fin = pd.to_datetime(pdf_fecha), pd.to_datetime(pdf_fecha)
-        pdf_df_oee_target = df_oee_diario[df_oee_diario['Fecha_Filtro'] == pdf_ini]
-        pdf_label = f"Día {pdf_fecha.strftime('%d-%m-%Y')}"
+        pdf_periodo = resolve_period("Diario", pdf_fecha, pdf_oee)
         
     elif pdf_tipo == "Semanal":
-        if not df_oee_sem.empty:
-            pdf_sem = st.selectbox("Semana para PDF:", opciones_sem, key="pdf_sem_sel")
-            pdf_df_oee_target = df_oee_sem[df_oee_sem[col_sem] == pdf_sem]
-            pdf_label = f"Semana {pdf_sem}"
-            
-            col_ini_p = next((c for c in pdf_df_oee_target.columns if 'inicio' in c.lower()), None)
-            col_fin_p = next((c for c in pdf_df_oee_target.columns if 'fin' in c.lower()), None)
-            if col_ini_p and col_fin_p and not pdf_df_oee_target.empty:
-                pdf_ini = pd.to_datetime(pdf_df_oee_target.iloc[0][col_ini_p], dayfirst=True, errors='coerce')
-                pdf_fin = pd.to_datetime(pdf_df_oee_target.iloc[0][col_fin_p], dayfirst=True, errors='coerce')
+        if not pdf_oee.empty:
+            pdf_sem = st.selectbox("Semana para PDF:", period_options(pdf_oee, "Semanal"), key="pdf_sem_sel")
+            pdf_periodo = resolve_period("Semanal", pdf_sem, pdf_oee)
                 
     elif pdf_tipo == "Mensual":
-        if not df_oee_men.empty:
-            pdf_mes = st.selectbox("Mes para PDF:", opciones_mes, key="pdf_mes_sel")
-            pdf_df_oee_target = df_oee_men[df_oee_men[col_mes] == pdf_mes]
-            pdf_label = f"Mes {pdf_mes}"
-            
-            col_ini_p = next((c for c in pdf_df_oee_target.columns if 'inicio' in c.lower()), None)
-            col_fin_p = next((c for c in pdf_df_oee_target.columns if 'fin' in c.lower()), None)
-            if col_ini_p and col_fin_p and not pdf_df_oee_target.empty:
-                pdf_ini = pd.to_datetime(pdf_df_oee_target.iloc[0][col_ini_p], dayfirst=True, errors='coerce')
-                pdf_fin = pd.to_datetime(pdf_df_oee_target.iloc[0][col_fin_p], dayfirst=True, errors='coerce')
+        if not pdf_oee.empty:
+            pdf_mes = st.selectbox("Mes para PDF:", period_options(pdf_oee, "Mensual"), key="pdf_mes_sel")
+            pdf_periodo = resolve_period("Mensual", pdf_mes, pdf_oee)
+
+if pdf_periodo is None:
+    # Sin hoja OEE del período: el PDF sale sin datos
+    pdf_periodo = Period(pdf_tipo, None, "", pdf_oee.iloc[:0])
+pdf_metricas = all_metrics(motor(OEE_SHEETS[pdf_tipo], pdf_oee), pdf_periodo.oee_target, pdf_periodo.key)
 
 st.divider()
 
 # ==========================================
 # 5. LÓGICA DE DATOS Y DASHBOARD
 # ==========================================
-if ini_filtro is not None and fin_filtro is not None:
-    df_f = df_raw[(df_raw['Fecha_Filtro'] >= ini_filtro) & (df_raw['Fecha_Filtro'] <= fin_filtro)]
-    df_prod_f = df_prod_raw[(df_prod_raw['Fecha_Filtro'] >= ini_filtro) & (df_prod_raw['Fecha_Filtro'] <= fin_filtro)] if not df_prod_raw.empty else pd.DataFrame()
-    df_op_f = df_operarios_raw[(df_operarios_raw['Fecha_Filtro'] >= ini_filtro) & (df_operarios_raw['Fecha_Filtro'] <= fin_filtro)] if not df_operarios_raw.empty else pd.DataFrame()
-else:
-    df_f, df_prod_f, df_op_f = df_raw.copy(), df_prod_raw.copy(), df_operarios_raw.copy()
-
-df_f = df_f[df_f['Fábrica'].isin(fábricas) & df_f['Máquina'].isin(máquinas_globales)]
-
-def get_metrics(name_filter, target_df):
-    m = {'OEE': 0.0, 'DISP': 0.0, 'PERF': 0.0, 'CAL': 0.0}
-    if target_df.empty: return m
-    mask = target_df.apply(lambda row: row.astype(str).str.upper().str.contains(name_filter.upper()).any(), axis=1)
-    datos = target_df[mask]
-    if not datos.empty:
-        for key, col_search in {'OEE':'OEE', 'DISP':'Disponibilidad', 'PERF':'Performance', 'CAL':'Calidad'}.items():
-            actual_col = next((c for c in datos.columns if col_search.lower() in c.lower()), None)
-            if actual_col:
-                v = pd.to_numeric(datos[actual_col], errors='coerce').dropna().mean()
-                if pd.notna(v): m[key] = float(v/100 if v > 1.1 else v)
-    return m
+# Eventos y producción salen del rollup diario.
+# Son vistas del dataset compartido entre sesiones: se leen, nunca se modifican
+with timing.span("filtros", periodo=label_periodo):
+    # Fábrica y Máquina se filtran dentro del rollup (o en la base, con SQLite)
+    df_f = rollups['datos'].window(ini_filtro, fin_filtro, {'Fábrica': fábricas, 'Máquina': máquinas_globales})
+    df_prod_f = rollups['prod'].window(ini_filtro, fin_filtro) if not rollups['prod'].empty else pd.DataFrame()
 
 def get_color_hex(val):
     if val < 0.85: return "#E02020"
@@ -243,27 +214,36 @@ def show_metric_row(m):
 # ---- RENDER DEL DASHBOARD ----
 st.markdown(f"### Visualizando datos para: **{tipo_informe} - {label_periodo}**")
 
-show_metric_row(get_metrics('GENERAL', df_oee_target))
+with timing.span("metricas", periodo=label_periodo):
+    metricas = all_metrics(oee_engine, df_oee_target, periodo_key)
+show_metric_row(metricas['GENERAL'])
 
 t1, t2 = st.tabs(["Estampado", "Soldadura"])
 with t1:
-    show_metric_row(get_metrics('ESTAMPADO', df_oee_target))
+    show_metric_row(metricas['ESTAMPADO'])
     with st.expander("Ver Líneas"):
         for l in ['L1', 'L2', 'L3', 'L4']:
-            st.markdown(f"**{l}**"); show_metric_row(get_metrics(l, df_oee_target)); st.markdown("---")
+            st.markdown(f"**{l}**"); show_metric_row(metricas[l]); st.markdown("---")
 with t2:
-    show_metric_row(get_metrics('SOLDADURA', df_oee_target))
+    show_metric_row(metricas['SOLDADURA'])
     with st.expander("Ver Detalle"):
-        st.markdown("**Celdas Robotizadas**"); show_metric_row(get_metrics('CELDA', df_oee_target)); st.markdown("---")
-        st.markdown("**PRP**"); show_metric_row(get_metrics('PRP', df_oee_target))
+        st.markdown("**Celdas Robotizadas**"); show_metric_row(metricas['CELDA']); st.markdown("---")
+        st.markdown("**PRP**"); show_metric_row(metricas['PRP'])
+
+# Gráficos Adicionales: cada figura recibe solo sus datos ya agregados
+def show_chart(nombre, build):
+    # El span cubre agregación, armado de la figura y envío; `build` puede devolver None
+    with timing.span("figura", grafico=nombre) as campos:
+        fig = build()
+        if fig is not None:
+            campos["bytes"] = payload_bytes(fig)
+            st.plotly_chart(fig, use_container_width=True)
 
-# Gráficos Adicionales
 col_graf1, col_graf2 = st.columns(2)
 with col_graf1:
     st.subheader("Análisis de Tiempos")
     if not df_f.empty:
-        df_f['Tipo'] = df_f['Evento'].apply(lambda x: 'Producción' if 'Producción' in str(x) else 'Parada')
-        st.plotly_chart(px.pie(df_f, values='Tiempo (Min)', names='Tipo', hole=0.4), use_container_width=True)
+        show_chart("tiempos", lambda: pie_tiempos(tiempos_por_tipo(df_f)))
 
 with col_graf2:
     st.subheader("Balance Producción")
@@ -273,180 +253,81 @@ with col_graf2:
         c_r = next((c for c in df_prod_f.columns if 'retrabajo' in c.lower()), 'Retrabajo')
         c_o = next((c for c in df_prod_f.columns if 'observadas' in c.lower()), 'Observadas')
         if c_maq:
-            df_st = df_prod_f.groupby(c_maq)[[c_b, c_r, c_o]].sum().reset_index()
-            st.plotly_chart(px.bar(df_st, x=c_maq, y=[c_b, c_r, c_o], barmode='stack'), use_container_width=True)
+            show_chart("produccion", lambda: px.bar(produccion_por_maquina(df_prod_f, c_maq, [c_b, c_r, c_o]), x=c_maq, y=[c_b, c_r, c_o], barmode='stack'))
 
 st.markdown("---")
 st.subheader("Análisis de Fallas Top 15")
-df_fallas = df_f[df_f['Nivel Evento 3'].astype(str).str.contains('FALLA', case=False)].copy()
-if not df_fallas.empty:
-    top_f = df_fallas.groupby('Nivel Evento 6')['Tiempo (Min)'].sum().reset_index().sort_values('Tiempo (Min)', ascending=False).head(15)
-    fig = px.bar(top_f, x='Tiempo (Min)', y='Nivel Evento 6', orientation='h', text='Tiempo (Min)', color='Tiempo (Min)', color_continuous_scale='Reds')
-    fig.update_traces(texttemplate='%{text:.0f} min', textposition='outside')
-    fig.update_layout(yaxis={'categoryorder':'total ascending'}, coloraxis_showscale=False, height=450)
-    st.plotly_chart(fig, use_container_width=True)
+def figura_top_fallas():
+    top_f = top_fallas(df_f, 15)
+    return bar_top_fallas(top_f) if not top_f.empty else None
+
+show_chart("top fallas", figura_top_fallas)
 
 
 # ==========================================
-# 6. FUNCIONES DE PDF (FPDF)
+# 6. BOTONES DE EXPORTACIÓN PDF
 # ==========================================
-def clean_text(text):
-    if pd.isna(text): return "-"
-    return str(text).encode('latin-1', 'replace').decode('latin-1')
-
-def set_pdf_color(pdf, val):
-    if val < 0.85: pdf.set_text_color(220, 20, 20)
-    elif val <= 0.95: pdf.set_text_color(200, 150, 0)
-    else: pdf.set_text_color(33, 195, 84)
-
-def print_pdf_metric_row(pdf, prefix, m):
-    pdf.set_font("Arial", 'B', 10)
-    pdf.set_text_color(0, 0, 0)
-    pdf.write(6, clean_text(f"{prefix} | OEE: "))
-    set_pdf_color(pdf, m['OEE'])
-    pdf.write(6, f"{m['OEE']:.1%}")
-    
-    pdf.set_text_color(0, 0, 0)
-    pdf.write(6, clean_text(" | Disp: "))
-    set_pdf_color(pdf, m['DISP'])
-    pdf.write(6, f"{m['DISP']:.1%}")
-    
-    pdf.set_text_color(0, 0, 0)
-    pdf.write(6, clean_text(" | Perf: "))
-    set_pdf_color(pdf, m['PERF'])
-    pdf.write(6, f"{m['PERF']:.1%}")
-    
-    pdf.set_text_color(0, 0, 0)
-    pdf.write(6, clean_text(" | Calidad: "))
-    set_pdf_color(pdf, m['CAL'])
-    pdf.write(6, f"{m['CAL']:.1%}")
-    
-    pdf.set_text_color(0, 0, 0)
-    pdf.ln(6)
-
-def crear_pdf(area, label_reporte, oee_target_df, ini_date, fin_date):
-    # Filtrar bases crudas si hay rango de fechas
-    if ini_date is not None and fin_date is not None:
-        df_pdf_raw = df_raw[(df_raw['Fecha_Filtro'] >= ini_date) & (df_raw['Fecha_Filtro'] <= fin_date)]
-        df_prod_pdf_raw = df_prod_raw[(df_prod_raw['Fecha_Filtro'] >= ini_date) & (df_prod_raw['Fecha_Filtro'] <= fin_date)] if not df_prod_raw.empty else pd.DataFrame()
-        df_op_pdf_raw = df_operarios_raw[(df_operarios_raw['Fecha_Filtro'] >= ini_date) & (df_operarios_raw['Fecha_Filtro'] <= fin_date)] if not df_operarios_raw.empty else pd.DataFrame()
+if "pdf_jobs" not in st.session_state:
+    st.session_state.pdf_jobs = {}
+
+def mostrar_reporte(area):
+    # (clave, período) del último pedido de la sesión: el PDF sigue en disco
+    # aunque la cola ya haya descartado el trabajo
+    key, label = st.session_state.pdf_jobs.get(area, (None, None))
+    job = get_report_queue().find(key, area, label)
+    if job is None:
+        return
+    if job.status == LISTO:
+        st.download_button(f"⬇️ Guardar {area}", data=job.pdf, file_name=job.filename, mime="application/pdf", use_container_width=True, key=f"dl_{area}")
+    elif job.status == ERROR:
+        st.error(f"Error generando PDF: {job.error}")
     else:
-        # Fallback si el reporte no tiene fechas
-        df_pdf_raw = pd.DataFrame(columns=df_raw.columns)
-        df_prod_pdf_raw = pd.DataFrame(columns=df_prod_raw.columns)
-        df_op_pdf_raw = pd.DataFrame(columns=df_operarios_raw.columns)
-
-    df_pdf = df_pdf_raw[df_pdf_raw['Fábrica'].str.contains(area, case=False, na=False)].copy()
-    
-    df_prod_pdf = pd.DataFrame()
-    if not df_prod_pdf_raw.empty:
-        df_prod_pdf = df_prod_pdf_raw[(df_prod_pdf_raw['Máquina'].str.contains(area, case=False, na=False)) | 
-                                      (df_prod_pdf_raw['Máquina'].isin(df_pdf['Máquina'].unique()))].copy()
-
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, clean_text(f"Reporte de Indicadores - {area.upper()}"), ln=True, align='C')
-    pdf.set_font("Arial", size=10)
-    pdf.cell(0, 10, clean_text(f"Período del Reporte: {label_reporte}"), ln=True, align='C')
-    pdf.ln(5)
-
-    # 1. OEE DEL ÁREA Y MÁQUINAS
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(0, 10, clean_text("1. Resumen General y OEE"), ln=True)
-    
-    metrics_area = get_metrics(area, oee_target_df)
-    print_pdf_metric_row(pdf, f"General {area.upper()}", metrics_area)
-    
-    pdf.ln(2)
-    pdf.set_font("Arial", 'B', 10)
-    pdf.cell(0, 6, clean_text("Detalle OEE por Máquina/Línea:"), ln=True)
-    lineas = ['L1', 'L2', 'L3', 'L4'] if area.upper() == 'ESTAMPADO' else ['CELDA', 'PRP']
-    for l in lineas:
-        m_l = get_metrics(l, oee_target_df)
-        print_pdf_metric_row(pdf, f"   -> {l} ", m_l)
-    pdf.ln(5)
-
-    # 2. ANÁLISIS DE FALLAS
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(0, 10, clean_text("2. Análisis de Fallas"), ln=True)
-    df_fallas_area = df_pdf[df_pdf['Nivel Evento 3'].astype(str).str.contains('FALLA', case=False)]
-    
-    if not df_fallas_area.empty:
-        top_fallas = df_fallas_area.groupby('Nivel Evento 6')['Tiempo (Min)'].sum().reset_index().sort_values('Tiempo (Min)', ascending=False).head(10)
-        fig_fallas = px.bar(top_fallas, x='Nivel Evento 6', y='Tiempo (Min)', title=f"Top 10 Fallas - {area}", color='Tiempo (Min)', color_continuous_scale='Reds', text='Tiempo (Min)')
-        fig_fallas.update_traces(texttemplate='%{text:.1f}', textposition='outside', cliponaxis=False)
-        fig_fallas.update_layout(width=800, height=450, margin=dict(t=80, b=150, l=40, r=40))
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
-            fig_fallas.write_image(tmpfile.name, engine="kaleido")
-            pdf.image(tmpfile.name, w=170)
-            os.remove(tmpfile.name)
-        pdf.ln(5)
-    else:
-        pdf.set_font("Arial", '', 10)
-        pdf.cell(0, 8, clean_text("No hay datos detallados de fallas para este período."), ln=True)
-
-    # 3. PRODUCCIÓN VS PARADA
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(0, 10, clean_text("3. Relación Producción vs Parada"), ln=True)
-    if not df_pdf.empty:
-        df_pdf['Tipo'] = df_pdf['Evento'].apply(lambda x: 'Producción' if 'Producción' in str(x) else 'Parada')
-        fig_pie = px.pie(df_pdf, values='Tiempo (Min)', names='Tipo', hole=0.4, color='Tipo', color_discrete_map={'Producción':'#2CA02C', 'Parada':'#D62728'})
-        fig_pie.update_layout(width=500, height=350, margin=dict(t=30, b=20, l=20, r=20))
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile2:
-            fig_pie.write_image(tmpfile2.name, engine="kaleido")
-            pdf.image(tmpfile2.name, w=110)
-            os.remove(tmpfile2.name)
-    else:
-        pdf.set_font("Arial", '', 10)
-        pdf.cell(0, 8, clean_text("No hay datos de tiempos para este período."), ln=True)
-    pdf.ln(5)
-
-    # 4. PRODUCCIÓN POR MÁQUINA
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(0, 10, clean_text("4. Producción por Máquina"), ln=True)
-    if not df_prod_pdf.empty and 'Buenas' in df_prod_pdf.columns:
-        prod_maq = df_prod_pdf.groupby('Máquina')[['Buenas', 'Retrabajo', 'Observadas']].sum().reset_index()
-        fig_prod = px.bar(prod_maq, x='Máquina', y=['Buenas', 'Retrabajo', 'Observadas'], barmode='stack', color_discrete_sequence=['#1F77B4', '#FF7F0E', '#d62728'], text_auto=True)
-        fig_prod.update_layout(width=800, height=450, margin=dict(t=60, b=150, l=40, r=40))
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile3:
-            fig_prod.write_image(tmpfile3.name, engine="kaleido")
-            pdf.image(tmpfile3.name, w=170)
-            os.remove(tmpfile3.name)
-    else:
-        pdf.set_font("Arial", '', 10)
-        pdf.cell(0, 8, clean_text("No hay datos de producción para este período."), ln=True)
+        st.progress(job.progress, text=f"{job.label}: {job.step}...")
 
-    # FINALIZAR Y GUARDAR PDF
-    temp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    pdf.output(temp_pdf.name)
-    with open(temp_pdf.name, "rb") as f: pdf_bytes = f.read()
-    os.remove(temp_pdf.name)
-    return pdf_bytes
+def reportes_en_curso():
+    jobs = [get_report_queue().get(key) for key, _ in st.session_state.pdf_jobs.values()]
+    return any(job is not None and not job.done for job in jobs)
+
+def panel_reportes(en_curso):
+    # Se refresca solo mientras haya PDF generándose; al terminar, un rerun completo lo apaga
+    for area, col in zip(REPORT_AREAS, st.columns(2)):
+        with col:
+            mostrar_reporte(area)
+    if en_curso and not reportes_en_curso():
+        st.rerun()
 
-# ==========================================
-# 7. BOTONES DE EXPORTACIÓN PDF
-# ==========================================
 with col_p3:
     # Colocamos los botones de generar en las mismas columnas de arriba
-    with col_btn1:
-        if st.button("🛠️ Preparar PDF Estampado", use_container_width=True):
-            with st.spinner("Generando PDF..."):
-                try:
-                    pdf_data = crear_pdf("Estampado", pdf_label, pdf_df_oee_target, pdf_ini, pdf_fin)
-                    st.download_button("⬇️ Guardar Estampado", data=pdf_data, file_name=f"Estampado_{pdf_label.replace(' ', '_')}.pdf", mime="application/pdf", use_container_width=True)
-                except Exception as e:
-                    st.error(f"Error generando PDF: {e}")
-                    
-    with col_btn2:
-        if st.button("🛠️ Preparar PDF Soldadura", use_container_width=True):
-            with st.spinner("Generando PDF..."):
-                try:
-                    pdf_data = crear_pdf("Soldadura", pdf_label, pdf_df_oee_target, pdf_ini, pdf_fin)
-                    st.download_button("⬇️ Guardar Soldadura", data=pdf_data, file_name=f"Soldadura_{pdf_label.replace(' ', '_')}.pdf", mime="application/pdf", use_container_width=True)
-                except Exception as e:
-                    st.error(f"Error generando PDF: {e}")
+    for area, col in zip(REPORT_AREAS, st.columns(2)):
+        with col:
+            if st.button(f"🛠️ Preparar PDF {area}", use_container_width=True):
+                job = get_report_queue().submit(area, pdf_periodo, pdf_metricas, rollups)
+                st.session_state.pdf_jobs[area] = (job.key, job.label)
+
+    en_curso = reportes_en_curso()
+    st.fragment(panel_reportes, run_every=1 if en_curso else None)(en_curso)
+
+# ==========================================
+# 7. DIAGNÓSTICO DE RENDIMIENTO
+# ==========================================
+timing.record("rerun", time.perf_counter() - perf_t0)
+
+with st.expander("⏱️ Diagnóstico de rendimiento"):
+    st.caption("Etapas de esta recarga de la página")
+    # Todos los campos registrados (bytes, filas, memoria, modo...), sin la marca de tiempo
+    st.dataframe(pd.DataFrame(perf_run).drop(columns="ts", errors="ignore"), hide_index=True, use_container_width=True)
+    figuras = [s for s in perf_run if s["span"] == "figura" and "bytes" in s]
+    if figuras:
+        st.caption(f"Gráficos de esta recarga: {len(figuras)} figuras, {sum(s['bytes'] for s in figuras) / 1024:.1f} KB de JSON enviados al navegador")
+    col_diag1, col_diag2 = st.columns([3, 1])
+    with col_diag1:
+        st.caption("Acumulado del proceso (incluye recargas y PDF en segundo plano)")
+        st.dataframe(pd.DataFrame.from_dict(timing.stats(), orient="index"), use_container_width=True)
+    with col_diag2:
+        st.caption("Cachés")
+        st.dataframe(pd.Series(timing.counters(), name="veces"), use_container_width=True)
+    st.caption("Últimos spans del proceso (incluye descargas, parseo y copia local en segundo plano)")
+    ultimos = pd.DataFrame(timing.recent()[-100:][::-1])
+    if not ultimos.empty:
+        ultimos["ts"] = pd.to_datetime(ultimos["ts"], unit="s").dt.strftime("%H:%M:%S")
+    st.dataframe(ultimos, hide_index=True, use_container_width=True)
@@ -0,0 +1,65 @@
+"""fetch_sheets contra un servidor HTTP local: plazo total, reintentos y fallas parciales."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from sheets import build_session, fetch_sheets
+
+CSV = b"Fecha,Valor\n01/01/2024,1\n"
+
+
+class Handler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def do_GET(self):
+        gid = parse_qs(urlparse(self.path).query)["gid"][0]
+        n = self.hits[gid] = self.hits.get(gid, 0) + 1
+        if gid == "lenta":
+            time.sleep(2)
+        if gid == "caida" or (gid == "intermitente" and n == 1):
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(CSV)))
+        self.end_headers()
+        self.wfile.write(CSV)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    Handler.hits = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/spreadsheets/d/x/edit"
+    server.shutdown()
+    server.server_close()
+
+
+def test_falla_parcial(url):
+    res = fetch_sheets(url, {"ok": "ok", "caida": "caida"}, session=build_session(retries=1, backoff=0))
+    assert res["ok"].ok and res["ok"].content == CSV
+    assert not res["caida"].ok and res["caida"].error
+    assert list(res) == ["ok", "caida"]
+
+
+def test_reintenta_503(url):
+    res = fetch_sheets(url, {"intermitente": "intermitente"}, session=build_session(retries=2, backoff=0))
+    assert res["intermitente"].content == CSV
+    assert Handler.hits["intermitente"] == 2
+
+
+def test_plazo_total(url):
+    t0 = time.perf_counter()
+    res = fetch_sheets(url, {"ok": "ok", "lenta": "lenta"}, session=build_session(retries=0), deadline=0.5)
+    assert time.perf_counter() - t0 < 1.5
+    assert res["ok"].ok
+    assert not res["lenta"].ok and "sin respuesta" in res["lenta"].error
@@ -0,0 +1,67 @@
+"""Hojas bajo demanda de DatasetRefresher con un origen simulado."""
+import threading
+import time
+
+import pandas as pd
+
+import refresher
+from refresher import DatasetRefresher
+
+HOJA = pd.DataFrame({"Semana": ["S1"], "OEE": [0.9]})
+
+
+class OrigenFalso:
+    kind = "falso"
+    snapshots = False
+
+    def __init__(self, fallas=0, demora=0.0):
+        self.fallas = fallas
+        self.demora = demora
+        self.llamadas = 0
+
+    def load_sheet(self, name, store=None):
+        self.llamadas += 1
+        time.sleep(self.demora)
+        if self.llamadas <= self.fallas:
+            return pd.DataFrame(), [name]
+        return HOJA, []
+
+
+def test_primera_carga_fallida_se_reintenta(monkeypatch):
+    monkeypatch.setattr(refresher, "SHEET_RETRY", 0.05)
+    origen = OrigenFalso(fallas=1)
+    r = DatasetRefresher(origen, None, ttl={"oee_sem": 3600})
+    assert r.sheet("oee_sem").empty
+    # Dentro del plazo de reintento no se vuelve a descargar
+    assert r.sheet("oee_sem").empty and origen.llamadas == 1
+    time.sleep(0.06)
+    assert r.sheet("oee_sem") is HOJA and origen.llamadas == 2
+    # Con la hoja cargada vale el TTL completo
+    time.sleep(0.06)
+    assert r.sheet("oee_sem") is HOJA and origen.llamadas == 2
+
+
+def test_hoja_vencida_una_sola_recarga(monkeypatch):
+    origen = OrigenFalso()
+    r = DatasetRefresher(origen, None, ttl={"oee_men": 0.01})
+    assert r.sheet("oee_men") is HOJA
+    origen.demora = 0.2
+    time.sleep(0.02)
+    antes = threading.active_count()
+    # Vencida: se sirve la versión cargada y una sola recarga corre en segundo plano
+    assert all(r.sheet("oee_men") is HOJA for _ in range(20))
+    assert threading.active_count() - antes <= 1
+    time.sleep(0.3)
+    assert origen.llamadas == 2
+
+
+def test_recarga_fallida_conserva_la_anterior(monkeypatch):
+    origen = OrigenFalso()
+    r = DatasetRefresher(origen, None, ttl={"operarios": 0.01})
+    r.sheet("operarios")
+    origen.fallas = 2
+    time.sleep(0.02)
+    r.sheet("operarios")
+    time.sleep(0.05)
+    assert r.sheet("operarios") is HOJA
+    assert r._sheets["operarios"].fallidas == ("operarios",)
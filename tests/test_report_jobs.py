@@ -0,0 +1,135 @@
+"""ReportQueue en proceso, con un crear_pdf simulado y una caché en tmp_path."""
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import report_jobs
+from pdf_cache import PdfCache
+from report import Period
+from report_jobs import ERROR, GENERANDO, LISTO, PENDIENTE, ReportQueue
+
+
+def periodo(label):
+    return Period("Semanal", label, label, pd.DataFrame({"Semana": [label], "OEE": [0.9]}))
+
+
+def esperar(cond, timeout=5):
+    t0 = time.time()
+    while not cond():
+        if time.time() - t0 > timeout:
+            raise AssertionError("tiempo de espera agotado")
+        time.sleep(0.01)
+
+
+class PdfFalso:
+    """Reemplazo de crear_pdf que queda en 'Gráficos' hasta que se lo libera."""
+
+    def __init__(self, fallas=0):
+        self.liberar = threading.Event()
+        self.fallas = fallas
+        self.llamadas = 0
+
+    def __call__(self, area, label, metricas, ini, fin, rollups, progress=None):
+        self.llamadas += 1
+        progress(0.5, "Gráficos")
+        self.liberar.wait(5)
+        if self.llamadas <= self.fallas:
+            raise RuntimeError("falló el render")
+        return f"%PDF {area} {label}".encode()
+
+
+@pytest.fixture
+def pdf(monkeypatch):
+    falso = PdfFalso()
+    monkeypatch.setattr(report_jobs, "crear_pdf", falso)
+    return falso
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PdfCache(str(tmp_path))
+
+
+def test_estados_y_progreso(pdf, cache):
+    queue = ReportQueue(cache, workers=1)
+    primero = queue.submit("Estampado", periodo("S1"), {}, {})
+    segundo = queue.submit("Estampado", periodo("S2"), {}, {})
+    esperar(lambda: primero.status == GENERANDO and primero.step == "Gráficos")
+    assert primero.progress == 0.5
+    # Un solo worker: el segundo espera en la cola
+    assert segundo.status == PENDIENTE and segundo.step == "En cola"
+
+    pdf.liberar.set()
+    esperar(lambda: primero.done and segundo.done)
+    assert primero.status == LISTO and primero.progress == 1.0 and primero.step == "Listo"
+    assert primero.pdf == b"%PDF Estampado S1" and primero.finished_at is not None
+    assert cache.get(primero.key) == primero.pdf
+
+
+def test_pedido_repetido_devuelve_el_mismo_trabajo(pdf, cache):
+    queue = ReportQueue(cache)
+    job = queue.submit("Soldadura", periodo("S1"), {}, {})
+    assert queue.submit("Soldadura", periodo("S1"), {}, {}) is job
+    assert queue.submit("Estampado", periodo("S1"), {}, {}) is not job
+    pdf.liberar.set()
+    esperar(lambda: job.done)
+    assert queue.submit("Soldadura", periodo("S1"), {}, {}) is job
+    assert queue.get(job.key) is job
+    assert pdf.llamadas == 2
+
+
+def test_acierto_de_cache_no_encola(pdf, cache):
+    pdf.liberar.set()
+    job = ReportQueue(cache).submit("Estampado", periodo("S1"), {}, {})
+    esperar(lambda: job.done)
+    # Otra cola (otro proceso) con la misma caché en disco: listo sin generar
+    otro = ReportQueue(cache).submit("Estampado", periodo("S1"), {}, {})
+    assert otro.status == LISTO and otro.pdf == job.pdf
+    assert pdf.llamadas == 1
+
+
+def test_error_se_puede_reintentar(pdf, cache):
+    pdf.fallas = 1
+    pdf.liberar.set()
+    queue = ReportQueue(cache)
+    job = queue.submit("Estampado", periodo("S1"), {}, {})
+    esperar(lambda: job.done)
+    assert job.status == ERROR and job.error == "falló el render" and job.pdf is None
+    assert cache.get(job.key) is None
+
+    nuevo = queue.submit("Estampado", periodo("S1"), {}, {})
+    assert nuevo is not job
+    esperar(lambda: nuevo.done)
+    assert nuevo.status == LISTO and queue.get(job.key) is nuevo
+
+
+def test_trim_descarta_solo_terminados(pdf, cache):
+    queue = ReportQueue(cache, workers=1, max_jobs=2)
+    jobs = [queue.submit("Estampado", periodo(f"S{i}"), {}, {}) for i in range(3)]
+    # Ninguno terminó: se conservan los tres aunque superen max_jobs
+    assert all(queue.get(j.key) is j for j in jobs)
+
+    pdf.liberar.set()
+    esperar(lambda: all(j.done for j in jobs))
+    ultimo = queue.submit("Estampado", periodo("S3"), {}, {})
+    # Se van los terminados más viejos; el nuevo pedido, pendiente, queda
+    assert [queue.get(j.key) for j in jobs[:2]] == [None, None]
+    assert queue.get(jobs[2].key) is jobs[2] and queue.get(ultimo.key) is ultimo
+
+
+def test_trabajo_descartado_se_recupera_de_la_cache(pdf, cache):
+    pdf.liberar.set()
+    queue = ReportQueue(cache, max_jobs=1)
+    job = queue.submit("Soldadura", periodo("S1"), {}, {})
+    esperar(lambda: job.done)
+    otro = queue.submit("Soldadura", periodo("S2"), {}, {})
+    esperar(lambda: otro.done)
+    queue.submit("Soldadura", periodo("S3"), {}, {})
+    assert queue.get(job.key) is None
+
+    recuperado = queue.find(job.key, "Soldadura", "S1")
+    assert recuperado.status == LISTO and recuperado.pdf == job.pdf and recuperado.filename == job.filename
+    assert queue.find("otra-clave", "Soldadura", "S9") is None
+    assert queue.find(None, "Soldadura", None) is None
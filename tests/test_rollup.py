@@ -0,0 +1,81 @@
+"""Las agregaciones sobre DailyRollup.window dan lo mismo que sobre las filas crudas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate
+from charts import produccion_por_maquina, tiempos_por_tipo, top_fallas
+from dataset import DATE_COL, index_sheets
+from sheets import SHEET_GIDS, SHEET_SCHEMAS, process_df
+
+PROD_COLS = ['Buenas', 'Retrabajo', 'Observadas']
+
+
+@pytest.fixture(scope="module")
+def hojas():
+    sheets = generate(5000, days=60, seed=1)
+    frames = [process_df(sheets[n].to_csv(index=False, decimal=',').encode(), SHEET_SCHEMAS[n]) for n in SHEET_GIDS]
+    (datos, _, prod, *_), _, rollups = index_sheets(frames)
+    return datos, prod, rollups
+
+
+def crudo(df, ini, fin, filters=None):
+    mask = np.ones(len(df), dtype=bool)
+    if ini is not None and fin is not None:
+        mask &= ((df[DATE_COL] >= ini) & (df[DATE_COL] <= fin)).to_numpy()
+    for col, values in (filters or {}).items():
+        mask &= df[col].isin(values).to_numpy()
+    return df[mask]
+
+
+def normalizar(df, key):
+    out = df.assign(**{key: df[key].astype(str)}).set_index(key).sort_index()
+    return out.astype('float64')
+
+
+DIA = pd.Timestamp("2024-02-10")
+PERIODOS = {
+    "día": (DIA, DIA),
+    "semana": (pd.Timestamp("2024-02-05"), pd.Timestamp("2024-02-11")),
+    "mes": (pd.Timestamp("2024-02-01"), pd.Timestamp("2024-02-29")),
+    "todo": (None, None),
+}
+FILTROS = {
+    "sin filtro": None,
+    "fábrica": {'Fábrica': ['Estampado']},
+    "máquinas": {'Fábrica': ['Estampado', 'Soldadura'], 'Máquina': ['L1', 'L3', 'PRP']},
+}
+
+
+@pytest.mark.parametrize("filtro", FILTROS)
+@pytest.mark.parametrize("periodo", PERIODOS)
+def test_eventos(hojas, periodo, filtro):
+    datos, _, rollups = hojas
+    ini, fin = PERIODOS[periodo]
+    filters = FILTROS[filtro]
+    cube = rollups['datos'].window(ini, fin, filters)
+    raw = crudo(datos, ini, fin, filters)
+    assert not raw.empty
+    pd.testing.assert_frame_equal(normalizar(tiempos_por_tipo(cube), 'Tipo'), normalizar(tiempos_por_tipo(raw), 'Tipo'), rtol=1e-5)
+    pd.testing.assert_frame_equal(
+        normalizar(top_fallas(cube, 1000), 'Nivel Evento 6'), normalizar(top_fallas(raw, 1000), 'Nivel Evento 6'), rtol=1e-5)
+    # Las primeras 15 fallas tienen los mismos minutos
+    np.testing.assert_allclose(top_fallas(cube, 15)['Tiempo (Min)'], top_fallas(raw, 15)['Tiempo (Min)'], rtol=1e-5)
+
+
+@pytest.mark.parametrize("periodo", PERIODOS)
+def test_produccion(hojas, periodo):
+    _, prod, rollups = hojas
+    ini, fin = PERIODOS[periodo]
+    cube = rollups['prod'].window(ini, fin)
+    raw = crudo(prod, ini, fin)
+    assert not raw.empty
+    pd.testing.assert_frame_equal(
+        normalizar(produccion_por_maquina(cube, 'Máquina', PROD_COLS), 'Máquina'),
+        normalizar(produccion_por_maquina(raw, 'Máquina', PROD_COLS), 'Máquina'))
+
+
+def test_ventana_vacia(hojas):
+    _, _, rollups = hojas
+    assert rollups['datos'].window(pd.Timestamp("2030-01-01"), pd.Timestamp("2030-01-31")).empty
+    assert rollups['datos'].window(None, None, {'Máquina': []}).empty
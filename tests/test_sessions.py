@@ -0,0 +1,56 @@
+"""Varias sesiones del dashboard comparten un mismo Dataset sin copiarlo."""
+import gc
+import os
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.synthetic import ensure_csvs
+from refresher import DatasetRefresher
+from sheets import memory_bytes
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+SESIONES = 10
+# Crecimiento tolerado por sesión: estado de la sesión y elementos de la página
+MAX_MB_POR_SESION = 2.0
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS")) / 1024
+
+
+def sesion(csv_dir):
+    at = AppTest.from_file(APP, default_timeout=180)
+    at.secrets["source"] = {"type": "csv", "path": csv_dir}
+    at.run()
+    assert not at.exception, [e.value for e in at.exception]
+    return at
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="mide RSS con /proc")
+def test_memoria_plana_por_sesion(tmp_path, monkeypatch):
+    csv_dir = os.path.dirname(ensure_csvs(str(tmp_path / "csv"), 1_000_000, days=365)["datos"])
+    # Copia local y caché de PDF dentro de tmp_path
+    monkeypatch.chdir(tmp_path)
+    st.cache_resource.clear()
+
+    vistos = []
+    current = DatasetRefresher.current
+    monkeypatch.setattr(DatasetRefresher, "current", lambda self: vistos.append(current(self)) or vistos[-1])
+
+    # Las dos primeras sesiones cargan el dataset y calientan cachés e imports
+    sesiones = [sesion(csv_dir), sesion(csv_dir)]
+    gc.collect()
+    antes = rss_mb()
+    sesiones += [sesion(csv_dir) for _ in range(SESIONES)]
+    gc.collect()
+    por_sesion = (rss_mb() - antes) / SESIONES
+
+    dataset = vistos[0]
+    assert all(d is dataset for d in vistos)
+    dataset_mb = sum(memory_bytes(df) for df in dataset.frames) / 1e6
+    # Una copia de las hojas por sesión superaría holgadamente el límite
+    assert dataset_mb > 4 * MAX_MB_POR_SESION
+    assert por_sesion < MAX_MB_POR_SESION, f"{por_sesion:.2f} MB por sesión (dataset de {dataset_mb:.1f} MB)"
@@ -0,0 +1,116 @@
+"""La reconciliación incremental de SnapshotStore da lo mismo que process_df sobre el CSV completo."""
+import pandas as pd
+import pytest
+
+import timing
+from benchmarks.synthetic import generate
+from sheets import SHEET_SCHEMAS, process_df
+from snapshots import SnapshotStore, split_point
+
+COLA = 50
+SCHEMA = SHEET_SCHEMAS["datos"]
+
+
+@pytest.fixture(scope="module")
+def lineas():
+    df = generate(1200, days=40, seed=2)["datos"]
+    # Campos multilínea entre comillas, algunos cerca del corte de la cola
+    for i in (5, 1100, 1160, 1175):
+        df.loc[i, "Nivel Evento 6"] = "Causa\nen dos líneas, con coma"
+    return df.to_csv(index=False, decimal=",").splitlines(keepends=True)
+
+
+def armar(header, filas, eol="\n"):
+    return "".join(line.replace("\r\n", "\n").replace("\n", eol) for line in [header] + filas).encode()
+
+
+def filas_csv(lineas):
+    # Agrupa las líneas físicas en filas lógicas (comillas balanceadas)
+    filas, actual = [], ""
+    for line in lineas[1:]:
+        actual += line
+        if actual.count('"') % 2 == 0:
+            filas.append(actual)
+            actual = ""
+    return lineas[0], filas
+
+
+def modo():
+    return next(s["modo"] for s in reversed(timing.recent()) if s["span"] == "snapshot")
+
+
+def igual_a_completo(store, content):
+    df = store.refresh("datos", content, SCHEMA)
+    full = process_df(content, SCHEMA)
+    # Al unir prefijo y cola las categorías quedan ordenadas; los valores, iguales
+    pd.testing.assert_frame_equal(df, full, check_categorical=False)
+    for col in full.select_dtypes("category"):
+        assert set(df[col].cat.categories) == set(full[col].cat.categories)
+    assert df.attrs["raw_rows"] == full.attrs["raw_rows"]
+    return df
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path), tail_rows=COLA)
+
+
+@pytest.mark.parametrize("eol", ["\n", "\r\n"])
+def test_agregados_sucesivos(store, lineas, eol):
+    header, filas = filas_csv(lineas)
+    igual_a_completo(store, armar(header, filas[:800], eol))
+    for fin in (830, 860, 900, 940):
+        igual_a_completo(store, armar(header, filas[:fin], eol))
+        assert modo() == "cola"
+    # Una cola de más de 4 x tail_rows filas se reprocesa entera y se vuelve a cortar
+    igual_a_completo(store, armar(header, filas, eol))
+    assert modo() == "completa"
+    igual_a_completo(store, armar(header, filas + filas[-5:], eol))
+    assert modo() == "cola"
+
+
+def test_edicion_en_la_cola(store, lineas):
+    header, filas = filas_csv(lineas)
+    igual_a_completo(store, armar(header, filas))
+    editadas = filas[:-10] + [f.replace("Parada", "Producción") for f in filas[-10:]]
+    igual_a_completo(store, armar(header, editadas))
+    assert modo() == "cola"
+
+
+def test_edicion_en_el_prefijo_reprocesa(store, lineas):
+    header, filas = filas_csv(lineas)
+    igual_a_completo(store, armar(header, filas))
+    igual_a_completo(store, armar(header, [filas[0].replace("Parada", "Producción")] + filas[1:]))
+    assert modo() == "completa"
+
+
+def test_cola_que_se_achica(store, lineas):
+    header, filas = filas_csv(lineas)
+    igual_a_completo(store, armar(header, filas))
+    igual_a_completo(store, armar(header, filas[:-20]))
+    assert modo() == "cola"
+    # Más corto que el prefijo guardado: no puede ser incremental
+    igual_a_completo(store, armar(header, filas[:300]))
+    assert modo() == "completa"
+    igual_a_completo(store, armar(header, filas[:310]))
+
+
+def test_fechas_invalidas_en_la_cola(store, lineas):
+    header, filas = filas_csv(lineas)
+    igual_a_completo(store, armar(header, filas[:1000]))
+    # Filas descartadas por fecha: el índice sigue contando las filas crudas
+    rotas = ["xx/xx/xxxx" + f[f.index(","):] for f in filas[1000:1010]]
+    df = igual_a_completo(store, armar(header, filas[:1000] + rotas + filas[1010:]))
+    assert df.attrs["raw_rows"] == len(filas)
+
+
+@pytest.mark.parametrize("eol", ["\n", "\r\n"])
+def test_split_point_respeta_comillas(lineas, eol):
+    header, filas = filas_csv(lineas)
+    content = armar(header, filas, eol)
+    for tail in (1, 10, 25, 40, 100, 5000):
+        pos = split_point(content, tail)
+        assert content[:pos].count(b'"') % 2 == 0
+        assert content[pos - 1:pos] == b"\n" and pos >= len(armar(header, [], eol))
+    # La cola tiene a lo sumo las filas pedidas (más las de un campo multilínea)
+    assert len(process_df(armar(header, [], eol) + content[split_point(content, 25):], SCHEMA)) <= 25
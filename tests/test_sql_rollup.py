@@ -0,0 +1,67 @@
+"""SqlRollup.window (consulta en SQLite) da lo mismo que DailyRollup.window en memoria."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate
+from dataset import DATE_COL, index_sheets
+from sheets import SHEET_GIDS, SHEET_SCHEMAS, process_df
+from sources import SqliteSource, archive_sqlite
+
+
+@pytest.fixture(scope="module")
+def rollups(tmp_path_factory):
+    sheets = generate(5000, days=60, seed=3)
+    frames = [process_df(sheets[n].to_csv(index=False, decimal=',').encode(), SHEET_SCHEMAS[n]) for n in SHEET_GIDS]
+    _, _, memoria = index_sheets(frames)
+    db = str(tmp_path_factory.mktemp("sql") / "eventos.db")
+    archive_sqlite(frames, db)
+    (_, indexes, sql), fallidas = SqliteSource(db).load()
+    assert not fallidas
+    return memoria, sql, indexes
+
+
+def normalizar(df, keys):
+    out = df.copy()
+    for k in keys:
+        out[k] = out[k].astype(str)
+    out[DATE_COL] = pd.to_datetime(out[DATE_COL]).astype('datetime64[ns]')
+    return out.sort_values([DATE_COL] + keys).reset_index(drop=True)
+
+
+RANGOS = {
+    "día": (pd.Timestamp("2024-02-10"), pd.Timestamp("2024-02-10")),
+    "semana": (pd.Timestamp("2024-02-05"), pd.Timestamp("2024-02-11")),
+    "todo": (None, None),
+    "fuera de rango": (pd.Timestamp("2030-01-01"), pd.Timestamp("2030-01-31")),
+}
+FILTROS = {
+    "sin filtro": ({}, {}),
+    "fábrica": ({'Fábrica': ['Soldadura']}, {}),
+    "máquinas": ({'Fábrica': ['Estampado', 'Soldadura'], 'Máquina': ['L2', 'CELDA 1']}, {}),
+    "vacío": ({'Máquina': []}, {}),
+    "contiene": ({}, {'Fábrica': 'estamp'}),
+    "contiene y máquinas": ({'Máquina': ['L1', 'PRP']}, {'Fábrica': 'ESTAMPADO'}),
+    "comodín literal": ({}, {'Máquina': '_'}),
+}
+
+
+@pytest.mark.parametrize("filtro", FILTROS)
+@pytest.mark.parametrize("rango", RANGOS)
+@pytest.mark.parametrize("hoja", ["datos", "prod"])
+def test_window_igual(rollups, hoja, rango, filtro):
+    memoria, sql, _ = rollups
+    ini, fin = RANGOS[rango]
+    filters, contains = FILTROS[filtro]
+    a, b = memoria[hoja].window(ini, fin, filters, contains), sql[hoja].window(ini, fin, filters, contains)
+    assert list(a.columns) == list(b.columns)
+    keys = memoria[hoja].keys
+    pd.testing.assert_frame_equal(normalizar(a, keys), normalizar(b, keys), check_dtype=False, rtol=1e-5)
+
+
+def test_indice_de_fechas_y_maquinas(rollups):
+    memoria, _, indexes = rollups
+    assert indexes['datos'].machines == memoria['datos'].index.machines
+    assert indexes['datos'].first_day() == memoria['datos'].index.first_day()
+    assert indexes['datos'].last_day() == memoria['datos'].index.last_day()
+    assert np.array_equal(indexes['datos'].days, memoria['datos'].index.days)
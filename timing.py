@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("indicadores.perf")
+
+RECENT_SPANS = 500
+# Nivel del log de spans; WARNING lo apaga
+PERF_LOG_LEVEL = os.environ.get("INDICADORES_PERF_LOG", "INFO")
+
+# Streamlit solo configura sus loggers: sin esto las líneas JSON no salen
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(PERF_LOG_LEVEL)
+    logger.propagate = False
+
+_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_SPANS)
+_stats = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0})
+_counters = defaultdict(int)
+_local = threading.local()
+
+
+# ==========================================
+# SPANS Y CONTADORES
+# ==========================================
+def record(stage, seconds, **fields):
+    """Registra una etapa ya medida y la emite como una línea JSON."""
+    item = {"span": stage, "ms": round(seconds * 1000, 2), "ts": time.time(), **fields}
+    with _lock:
+        _recent.append(item)
+        s = _stats[stage]
+        s["count"] += 1
+        s["total"] += seconds
+        s["max"] = max(s["max"], seconds)
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.append(item)
+    logger.info(json.dumps(item, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def span(stage, **fields):
+    t0 = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record(stage, time.perf_counter() - t0, **fields)
+
+
+def count(name, hit):
+    """Contador de aciertos/fallos de una caché: `name.hit` o `name.miss`."""
+    with _lock:
+        _counters[f"{name}.{'hit' if hit else 'miss'}"] += 1
+
+
+# ==========================================
+# LECTURA
+# ==========================================
+def begin_run():
+    """Empieza a juntar los spans de este hilo (un rerun de Streamlit)."""
+    _local.run = []
+    return _local.run
+
+
+def stats():
+    """Resumen por etapa desde que arrancó el proceso."""
+    with _lock:
+        return {
+            stage: {"count": s["count"], "total_ms": round(s["total"] * 1000, 2),
+                    "avg_ms": round(s["total"] / s["count"] * 1000, 2), "max_ms": round(s["max"] * 1000, 2)}
+            for stage, s in _stats.items()
+        }
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def recent():
+    with _lock:
+        return list(_recent)